@@ -0,0 +1,107 @@
+import zipfile
+
+
+class ZipStream:
+    """Write-only sink for zipfile that hands out the bytes written so far
+    
+    zipfile falls back to data descriptors on unseekable files, so entries can
+    be sent as soon as they are written.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._archive = zipfile.ZipFile(self, 'w', zipfile.ZIP_STORED)
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def add(self, name: str, data: bytes) -> bytes:
+        """Add a file and return the archive bytes produced for it"""
+        self._archive.writestr(name, data)
+        return self.take()
+    
+    def close(self) -> bytes:
+        """Finish the archive and return its central directory"""
+        self._archive.close()
+        return self.take()
+    
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class PdfStream:
+    """Minimal PDF writer that emits one JPEG page at a time
+    
+    Only object offsets are kept between pages, so memory does not grow with
+    the page count. Catalog and page tree are written at the end.
+    """
+    CATALOG = 1
+    PAGES = 2
+    
+    def __init__(self, dpi: int = 144):
+        self.scale = 72 / dpi
+        self._chunks = []
+        self._position = 0
+        self._offsets = {}
+        self._next_id = 3
+        self._pages = []
+        self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    
+    def _emit(self, data: bytes):
+        self._chunks.append(data)
+        self._position += len(data)
+    
+    def _object(self, obj_id: int, body: bytes, stream: bytes = None):
+        self._offsets[obj_id] = self._position
+        self._emit(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._emit(b"\nstream\n")
+            self._emit(stream)
+            self._emit(b"\nendstream")
+        self._emit(b"\nendobj\n")
+    
+    def _allocate(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+    
+    def add_page(self, jpeg: bytes, width: int, height: int) -> bytes:
+        """Add a page showing a baseline RGB JPEG, return the bytes produced for it"""
+        image_id, content_id, page_id = self._allocate(), self._allocate(), self._allocate()
+        page_width, page_height = width * self.scale, height * self.scale
+        
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>"
+        ).encode(), jpeg)
+        content = f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {page_width:.2f} {page_height:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._pages.append(page_id)
+        return self.take()
+    
+    def close(self) -> bytes:
+        """Write page tree, catalog and cross-reference table"""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._pages)
+        self._object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode())
+        self._object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode())
+        
+        xref_offset = self._position
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self._next_id)]
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._emit("".join(lines).encode())
+        return self.take()
+    
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
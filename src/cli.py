@@ -1,38 +1,266 @@
 import click
 import json
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from pathlib import Path
-from src.models import SlideRequest
-from src.image_generator import generate_slide_image, generate_vertical_slide_image
+from src.models import SlideRequest, OutputOptions
+from src.image_generator import render_slide, render_deck_page, render_error_page, layout_slide, paginate_slide
+from src.layout import warm_up_fonts
+from src.archive import PdfStream, ZipStream
 
 
-@click.command()
+class DefaultGroup(click.Group):
+    """Group that falls back to a default command, so `-i/-o` keeps working"""
+    def __init__(self, *args, default_command: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+    
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in self.get_help_option_names(ctx):
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultGroup, default_command='generate')
+def cli():
+    """Generate slide images from JSON"""
+
+
+@cli.command()
 @click.option('--input', '-i', type=click.File('r'), required=True, 
               help='Input JSON file')
-@click.option('--output', '-o', type=click.Path(), required=True,
-              help='Output PNG file path')
-def generate(input, output):
+@click.option('--output', '-o', type=click.Path(),
+              help='Output file path (.png, .webp or .jpg)')
+@click.option('--quality', type=click.IntRange(1, 100), help='WebP/JPEG quality')
+@click.option('--fast', is_flag=True, help='Favor encode speed over file size')
+@click.option('--layout', 'layout_only', is_flag=True,
+              help='Print element boxes and overflow as JSON instead of rendering')
+def generate(input, output, quality, fast, layout_only):
     """Generate slide image from JSON input"""
+    if not output and not layout_only:
+        raise click.UsageError("Missing option '--output' / '-o'.")
     try:
         # Parse JSON input
         data = json.load(input)
         request = SlideRequest(**data)
         
-        # Generate image
-        if request.format == "vertical":
-            image_bytes = generate_vertical_slide_image(request)
-        else:
-            image_bytes = generate_slide_image(request)
+        if layout_only:
+            result = json.dumps(layout_slide(request), ensure_ascii=False, indent=2)
+            if output:
+                Path(output).write_text(result + "\n", encoding='utf-8')
+            else:
+                click.echo(result)
+            return
+        
+        # Generate image, encoded by file extension
+        suffix = Path(output).suffix.lower()
+        output_format = {'.webp': 'webp', '.jpg': 'jpeg', '.jpeg': 'jpeg'}.get(suffix, 'png')
+        options = OutputOptions(format=output_format, quality=quality, fast=fast)
+        image_bytes = render_slide(request, options)
         
         # Save to file
         output_path = Path(output)
         output_path.write_bytes(image_bytes)
         
         click.echo(f"Generated slide image: {output}")
-        
+    
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         raise click.Abort()
 
 
+def iter_inputs(source: Path):
+    """(name, mtime, JSON text) for each slide in a JSONL file or a directory of JSON files"""
+    if source.is_dir():
+        for path in sorted(source.glob('*.json')):
+            yield path.stem, path.stat().st_mtime, path.read_text(encoding='utf-8')
+    else:
+        mtime = source.stat().st_mtime
+        with source.open(encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"{source.stem}-{line_number:04d}", mtime, line
+
+
+def render_job(text: str, output: str) -> int:
+    """Render one slide and write it, returns the file size"""
+    request = SlideRequest(**json.loads(text))
+    image_bytes = render_slide(request)
+    Path(output).write_bytes(image_bytes)
+    return len(image_bytes)
+
+
+def png_job(text: str) -> bytes:
+    return render_slide(SlideRequest(**json.loads(text)))
+
+
+def pdf_page_job(text: str) -> tuple:
+    return render_deck_page(SlideRequest(**json.loads(text)))
+
+
+def deck_pages(text: str) -> list:
+    """JSON of the slide followed by its table continuation slides"""
+    try:
+        request = SlideRequest(**json.loads(text))
+    except Exception:
+        return [text]  # Reported when the slide is rendered
+    if not request.table or not request.table.paginate:
+        return [text]
+    return [page.model_dump_json() for page in paginate_slide(request)]
+
+
+def in_order(pool, fn, items, window: int):
+    """(item, future of fn(item)) in input order, with at most window in flight"""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+
+def error_page(text: str, index: int, error: str) -> tuple:
+    """PDF page for a failed slide, sized like the slide when its JSON is valid"""
+    try:
+        request = SlideRequest(**json.loads(text))
+    except Exception:
+        request = SlideRequest()
+    return render_error_page(request, index, error)
+
+
+def create_pool(jobs: int):
+    # Each worker process loads fonts once and keeps its caches between slides
+    if jobs == 1:
+        return InlineExecutor()
+    return ProcessPoolExecutor(max_workers=jobs, initializer=warm_up_fonts)
+
+
+class InlineExecutor:
+    """Runs jobs in the calling process, for --jobs 1"""
+    def __init__(self):
+        warm_up_fonts()
+    
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+@cli.command()
+@click.argument('source', type=click.Path(exists=True, path_type=Path))
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False, path_type=Path), required=True,
+              help='Directory for the PNG files')
+@click.option('--name', default='{name}.png', show_default=True,
+              help='Output file name template, with {name} (input name) and {index} (1-based)')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Worker processes')
+@click.option('--force', is_flag=True, help='Render even if the output is up to date')
+def batch(source, output_dir, name, jobs, force):
+    """Generate slides from a JSONL file or a directory of JSON files"""
+    # Catch template typos before any slide is rendered
+    try:
+        name.format(name="slide", index=1)
+    except (KeyError, IndexError, ValueError) as e:
+        raise click.BadParameter(f"invalid template: {type(e).__name__}: {e}", param_hint="'--name'")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rendered = skipped = failed = total_bytes = 0
+    started = time.perf_counter()
+    
+    def collect(futures, done):
+        nonlocal rendered, failed, total_bytes
+        for future in done:
+            output = futures.pop(future)
+            try:
+                total_bytes += future.result()
+                rendered += 1
+            except Exception as e:
+                failed += 1
+                click.echo(f"Error: {output.name}: {e}", err=True)
+    
+    futures = {}
+    with create_pool(jobs) as pool:
+        for index, (input_name, mtime, text) in enumerate(iter_inputs(source), 1):
+            output = output_dir / name.format(name=input_name, index=index)
+            if not force and output.exists() and output.stat().st_mtime >= mtime:
+                skipped += 1
+                continue
+            
+            # Keep a bounded number of slides in flight while streaming the input
+            if len(futures) >= jobs * 2:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                collect(futures, done)
+            futures[pool.submit(render_job, text, str(output))] = output
+        collect(futures, wait(futures).done)
+    
+    elapsed = time.perf_counter() - started
+    rate = rendered / elapsed if elapsed > 0 else 0
+    click.echo(
+        f"Rendered {rendered}, skipped {skipped}, failed {failed} in {elapsed:.1f}s "
+        f"({rate:.1f} slides/s, {total_bytes / 1024 / 1024:.1f} MB)"
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument('source', type=click.Path(exists=True, path_type=Path))
+@click.option('--output', '-o', type=click.Path(dir_okay=False, path_type=Path), required=True,
+              help='Output .pdf (one page per slide) or .zip (PNGs) file')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Worker processes')
+def deck(source, output, jobs):
+    """Write slides from a JSONL file or a directory of JSON files as one deck"""
+    if output.suffix.lower() not in ('.pdf', '.zip'):
+        raise click.BadParameter("must end with .pdf or .zip", param_hint="'--output'")
+    is_pdf = output.suffix.lower() == '.pdf'
+    writer = PdfStream() if is_pdf else ZipStream()
+    manifest = []
+    pages = failed = 0
+    started = time.perf_counter()
+    
+    # Pages are written as they finish, so only the window is held in memory
+    texts = (page for _, _, text in iter_inputs(source) for page in deck_pages(text))
+    with create_pool(jobs) as pool, output.open('wb') as f:
+        for index, (text, future) in enumerate(in_order(pool, pdf_page_job if is_pdf else png_job, texts, jobs * 2)):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                error = f"{type(e).__name__}: {e}"
+                click.echo(f"Error: slide {index + 1}: {e}", err=True)
+                if is_pdf:
+                    # Keep one page per slide so later pages do not shift
+                    f.write(writer.add_page(*error_page(text, index, error)))
+                else:
+                    manifest.append({"index": index, "error": error})
+                continue
+            pages += 1
+            if is_pdf:
+                f.write(writer.add_page(*result))
+            else:
+                name = f"slide-{index + 1:03d}.png"
+                manifest.append({"index": index, "file": name})
+                f.write(writer.add(name, result))
+        if not is_pdf:
+            f.write(writer.add("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')))
+        f.write(writer.close())
+    
+    elapsed = time.perf_counter() - started
+    click.echo(f"Wrote {pages} slides to {output}, failed {failed} in {elapsed:.1f}s")
+    if failed:
+        raise SystemExit(1)
+
+
 if __name__ == '__main__':
-    generate()
\ No newline at end of file
+    cli()
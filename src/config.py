@@ -0,0 +1,84 @@
+import os
+
+
+DEFAULT_FONT_PATHS = [
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "C:\\Windows\\Fonts\\msgothic.ttc"
+]
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read integer setting from environment"""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read float setting from environment"""
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+# Render executor
+RENDER_EXECUTOR = os.environ.get("RENDER_EXECUTOR", "thread")  # "thread" or "process"
+RENDER_WORKERS = _env_int("RENDER_WORKERS", os.cpu_count() or 1)
+RENDER_MAX_QUEUE = _env_int("RENDER_MAX_QUEUE", 32)  # Jobs allowed to wait for a worker
+RENDER_RETRY_AFTER = _env_int("RENDER_RETRY_AFTER", 5)  # Seconds, sent with 503
+BATCH_MAX_SLIDES = _env_int("BATCH_MAX_SLIDES", 100)  # Slides per /generate/batch and /generate/deck request
+DECK_JPEG_QUALITY = _env_int("DECK_JPEG_QUALITY", 90)  # JPEG quality of PDF deck pages
+
+# Output encoding defaults (format and options are chosen per request)
+WEBP_QUALITY = _env_int("WEBP_QUALITY", 80)
+JPEG_QUALITY = _env_int("JPEG_QUALITY", 85)
+PREPARE_WORKERS = _env_int("PREPARE_WORKERS", 8)  # Image, map and chart preparation per process
+
+# Rendered slides, keyed by a hash of the request
+RENDER_CACHE_MAX_MB = _env_int("RENDER_CACHE_MAX_MB", 64)  # In memory, 0 disables
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", "")  # Empty disables the disk tier
+RENDER_CACHE_DISK_MAX_MB = _env_int("RENDER_CACHE_DISK_MAX_MB", 512)
+RENDER_CACHE_TTL = _env_int("RENDER_CACHE_TTL", 3600)  # Seconds, remote images and maps are refreshed after this
+
+# Fonts (FONT_PATHS is separated by os.pathsep, first usable path wins)
+FONT_PATHS = os.environ["FONT_PATHS"].split(os.pathsep) if os.environ.get("FONT_PATHS") else DEFAULT_FONT_PATHS
+FONT_INDEX = _env_int("FONT_INDEX", 0)  # Face index inside .ttc collections
+
+# Emoji sprites (<codepoints>.png, as in the Twemoji assets)
+EMOJI_DIR = os.environ.get("EMOJI_DIR", os.path.expanduser("~/.cache/data2slideimg/emoji"))  # Empty disables
+EMOJI_FETCH_URL = os.environ.get("EMOJI_FETCH_URL", "https://emojicdn.elk.sh/{emoji}?style=twitter")  # Empty renders offline
+EMOJI_TIMEOUT = _env_float("EMOJI_TIMEOUT", 5.0)  # Seconds per sprite download
+EMOJI_CACHE_SIZE = _env_int("EMOJI_CACHE_SIZE", 256)  # Decoded, scaled sprites kept in memory
+EMOJI_RETRY = _env_float("EMOJI_RETRY", 60.0)  # Seconds before a failed sprite download is tried again
+
+# Gradient backgrounds
+GRADIENT_CACHE_SIZE = _env_int("GRADIENT_CACHE_SIZE", 16)  # Finished backgrounds kept in memory
+GRADIENT_RANDOM_POOL = _env_int("GRADIENT_RANDOM_POOL", 8)  # Random palettes for horizontal slides
+
+# Charts ("matplotlib" for high fidelity, "pillow" for speed)
+CHART_BACKEND = os.environ.get("CHART_BACKEND", "matplotlib")
+CHART_MAX_POINTS = _env_int("CHART_MAX_POINTS", 1000)  # Line charts are downsampled above this
+CHART_MAX_CATEGORIES = _env_int("CHART_MAX_CATEGORIES", 30)  # Bar/pie keep the largest, the rest become "other"
+CHART_MAX_LABELS = _env_int("CHART_MAX_LABELS", 12)  # X axis labels before they are thinned
+CHART_CACHE_MAX_MB = _env_int("CHART_CACHE_MAX_MB", 32)  # Rendered charts kept in memory per process, 0 disables
+
+# Map tiles ("http", "mbtiles:<file>" or "dir:<directory with {z}/{x}/{y}.png>")
+TILE_SOURCE = os.environ.get("TILE_SOURCE", "http")
+MBTILES_MMAP_SIZE = _env_int("MBTILES_MMAP_SIZE", 256 * 1024 * 1024)  # Bytes of the MBTiles file to memory-map
+TILE_URL_TEMPLATE = os.environ.get("TILE_URL_TEMPLATE", "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png")
+TILE_TIMEOUT = _env_float("TILE_TIMEOUT", 5.0)  # Seconds per tile request
+TILE_DEADLINE = _env_float("TILE_DEADLINE", 8.0)  # Seconds for all tiles of a map
+TILE_FETCH_WORKERS = _env_int("TILE_FETCH_WORKERS", 8)  # Concurrent tile fetches
+TILE_MEMORY_CACHE_SIZE = _env_int("TILE_MEMORY_CACHE_SIZE", 256)  # Decoded tiles kept in memory
+TILE_CACHE_DIR = os.environ.get("TILE_CACHE_DIR", os.path.expanduser("~/.cache/data2slideimg/tiles"))  # Empty disables
+TILE_CACHE_MAX_MB = _env_int("TILE_CACHE_MAX_MB", 256)
+TILE_CACHE_TTL = _env_int("TILE_CACHE_TTL", 7 * 24 * 3600)  # Seconds
+
+# Remote images (ImageData.url)
+IMAGE_CONNECT_TIMEOUT = _env_float("IMAGE_CONNECT_TIMEOUT", 5.0)  # Seconds
+IMAGE_READ_TIMEOUT = _env_float("IMAGE_READ_TIMEOUT", 15.0)  # Seconds
+IMAGE_MAX_BYTES = _env_int("IMAGE_MAX_BYTES", 20 * 1024 * 1024)  # Larger downloads are refused
+IMAGE_MAX_DIMENSION = _env_int("IMAGE_MAX_DIMENSION", 1920)  # Decoded images are never larger per side
+IMAGE_MAX_PIXELS = _env_int("IMAGE_MAX_PIXELS", 50_000_000)  # Decompression bomb limit
+IMAGE_CACHE_SIZE = _env_int("IMAGE_CACHE_SIZE", 32)  # Decoded images kept in memory
+IMAGE_CACHE_FRESH = _env_float("IMAGE_CACHE_FRESH", 60.0)  # Seconds before a cached image is revalidated
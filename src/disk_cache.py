@@ -0,0 +1,103 @@
+from typing import Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: bytes):
+    """Write data through a temp file so readers never see partial files
+    
+    The temp name carries the process and thread id, since worker processes
+    may share the directory. Raises OSError.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """Files under a directory, expiring after ttl seconds and bounded by total size
+    
+    The total is computed on the first write and kept up to date by later
+    writes. Over the limit, expired files are removed, then the oldest until
+    under 90% of it.
+    """
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        
+        self._lock = threading.Lock()
+        self._bytes = None  # Computed on first write
+    
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def read(self, name: str) -> Optional[bytes]:
+        """File contents, or None if missing or expired"""
+        path = self.path(name)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def write(self, name: str, data: bytes):
+        path = self.path(name)
+        try:
+            write_atomic(path, data)
+        except OSError as e:
+            logger.warning("Failed to write disk cache %s: %s", path, e)
+            return
+        
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+    
+    def _scan(self) -> list:
+        """(mtime, size, path) of every cached file"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for mtime, size, path in entries:
+            if total <= target and now - mtime <= self.ttl:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        self._bytes = total
@@ -0,0 +1,115 @@
+import logging
+import numpy as np
+from src.models import GraphData
+from src import config
+
+logger = logging.getLogger(__name__)
+
+
+def lttb(values: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets
+    
+    The first and last points are always kept; every bucket in between
+    keeps the point forming the largest triangle with the previous pick and
+    the next bucket's average.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    
+    x = np.arange(count, dtype=float)
+    every = (count - 2) / (threshold - 2)
+    edges = np.append((np.arange(threshold - 1) * every).astype(int) + 1, count)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, count - 1
+    
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = values[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (values[start:end] - values[a])
+                      - (x[a] - x[start:end]) * (avg_y - values[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(values: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each bucket, plus both ends"""
+    count = len(values)
+    buckets = (threshold - 2) // 2
+    if threshold >= count or buckets < 1:
+        return np.arange(count)
+    
+    # Equal buckets, the last one padded with NaN
+    size = -(-count // buckets)
+    buckets = -(-count // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:count] = values
+    rows = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    picked = np.concatenate(([0, count - 1], offsets + np.nanargmin(rows, axis=1),
+                             offsets + np.nanargmax(rows, axis=1)))
+    return np.unique(picked)
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+
+def top_categories(values: np.ndarray, labels: np.ndarray, limit: int, other_label: str) -> tuple:
+    """The limit - 1 largest categories in their order, the rest summed as other"""
+    keep = np.sort(np.argpartition(-values, limit - 2)[:limit - 1])
+    rest = np.ones(len(values), dtype=bool)
+    rest[keep] = False
+    return (np.append(values[keep], values[rest].sum()),
+            np.append(labels[keep], other_label))
+
+
+class Series:
+    """Chart data after reduction
+    
+    `x` are positions in units of the original points (or categories after
+    top-N), so reduced line charts keep their spacing.
+    """
+    def __init__(self, x: np.ndarray, values: np.ndarray, labels: np.ndarray, count: int, original: int):
+        self.x = x
+        self.values = values
+        self.labels = labels
+        self.count = count  # Number of positions on the axis
+        self.original = original  # Number of points in the request
+    
+    @property
+    def reduced(self) -> bool:
+        return len(self.values) < self.original
+    
+    def ticks(self, max_labels: int) -> tuple:
+        """(positions, labels) of at most max_labels evenly spread points"""
+        if len(self.x) <= max_labels:
+            return self.x, self.labels
+        picked = np.unique(np.linspace(0, len(self.x) - 1, max_labels).round().astype(int))
+        return self.x[picked], self.labels[picked]
+
+
+def reduce_series(graph_data: GraphData) -> Series:
+    """Downsample line charts and fold small bar/pie categories into other"""
+    values = np.asarray(graph_data.data, dtype=float)
+    original = len(values)
+    # Missing labels are left blank, extra ones are ignored
+    labels = np.array([*graph_data.labels[:original], *[""] * (original - len(graph_data.labels))], dtype=object)
+    
+    if graph_data.type == "line":
+        limit = graph_data.max_points or config.CHART_MAX_POINTS
+        method = graph_data.downsample
+        if method != "none" and original > limit:
+            picked = DOWNSAMPLERS[method](values, limit)
+            logger.info("Line chart downsampled from %d to %d points (%s)", original, len(picked), method)
+            return Series(picked.astype(float), values[picked], labels[picked], original, original)
+    else:
+        limit = graph_data.max_categories or config.CHART_MAX_CATEGORIES
+        if original > limit:
+            values, labels = top_categories(values, labels, limit, graph_data.other_label)
+            logger.info("%s chart reduced from %d to %d categories", graph_data.type.capitalize(), original, len(values))
+    
+    return Series(np.arange(len(values), dtype=float), values, labels, len(values), original)
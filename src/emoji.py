@@ -0,0 +1,205 @@
+from PIL import Image, ImageDraw, ImageFont
+from io import BytesIO
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import quote_plus
+from pilmoji.helpers import EMOJI_REGEX, NodeType, to_nodes
+from src.disk_cache import write_atomic
+from src import config
+import logging
+import math
+import os
+import threading
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+DISCORD_EMOJI_URL = "https://cdn.discordapp.com/emojis/{id}.png"
+
+
+class EmojiFetchError(Exception):
+    """Raised when a sprite download failed for a reason that may go away (timeout, 5xx)"""
+
+
+def emoji_filename(emoji: str) -> str:
+    """Sprite name by codepoints, as in the Twemoji assets (1f44d.png, 1f1ef-1f1f5.png)"""
+    return '-'.join(f"{ord(char):x}" for char in emoji) + '.png'
+
+
+class EmojiStore:
+    """Emoji sprites from a local directory, optionally filled from a CDN
+    
+    Unicode emoji are read from `<dir>/<codepoints>.png` and Discord emoji
+    from `<dir>/discord/<id>.png`. With no fetch URL the store is offline
+    and emoji without a sprite are drawn as plain text. None means there is
+    no sprite; failed downloads raise EmojiFetchError.
+    """
+    def __init__(self, directory: Optional[str] = None, fetch_url: Optional[str] = None, timeout: float = 5.0):
+        self.directory = directory
+        self.fetch_url = fetch_url
+        self.timeout = timeout
+        self._session = None
+    
+    def get(self, emoji: str) -> Optional[bytes]:
+        names = [emoji_filename(emoji)]
+        # Twemoji drops the variation selector from most file names
+        if '\ufe0f' in emoji:
+            names.append(emoji_filename(emoji.replace('\ufe0f', '')))
+        for name in names:
+            data = self._read(name)
+            if data is not None:
+                return data
+        if not self.fetch_url:
+            return None
+        return self._fetch(self.fetch_url.format(emoji=quote_plus(emoji)), names[0])
+    
+    def get_discord(self, emoji_id: str) -> Optional[bytes]:
+        name = os.path.join('discord', f"{emoji_id}.png")
+        data = self._read(name)
+        if data is not None or not self.fetch_url:
+            return data
+        return self._fetch(DISCORD_EMOJI_URL.format(id=emoji_id), name)
+    
+    def _read(self, name: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _fetch(self, url: str, name: str) -> Optional[bytes]:
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = 'data2slideimg/1.0'
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise EmojiFetchError(f"Failed to fetch emoji {url}: {e}") from e
+        # Client errors mean there is no such sprite, the rest may be retried
+        if response.status_code >= 500 or response.status_code == 429:
+            raise EmojiFetchError(f"Failed to fetch emoji {url}: HTTP {response.status_code}")
+        if response.status_code >= 400:
+            return None
+        data = response.content
+        self._write(name, data)
+        return data
+    
+    def _write(self, name: str, data: bytes):
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, name)
+        try:
+            write_atomic(path, data)
+        except OSError as e:
+            logger.warning("Failed to write emoji cache %s: %s", path, e)
+
+
+class EmojiCache:
+    """LRU of decoded emoji sprites scaled to a font size
+    
+    Missing emoji are cached as None so they are not looked up on every
+    render. Failed downloads are only remembered for retry_seconds, so a
+    CDN outage does not leave emoji drawn as text for the life of the
+    process. Returned images are shared, callers must not modify them.
+    """
+    def __init__(self, store: EmojiStore, size: int = 256, retry_seconds: float = 60.0):
+        self.store = store
+        self.size = size
+        self.retry_seconds = retry_seconds
+        self._images = OrderedDict()  # key -> (sprite, expires_at or None)
+        self._lock = threading.Lock()
+    
+    def get(self, node_type: NodeType, content: str, width: int) -> Optional[Image.Image]:
+        key = (node_type, content, width)
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+                self._images.move_to_end(key)
+                return entry[0]
+        
+        expires_at = None
+        try:
+            if node_type is NodeType.discord_emoji:
+                data = self.store.get_discord(content)
+            else:
+                data = self.store.get(content)
+        except EmojiFetchError as e:
+            logger.warning("%s", e)
+            data = None
+            expires_at = time.monotonic() + self.retry_seconds
+        sprite = self._decode(data, width) if data is not None else None
+        
+        with self._lock:
+            self._images[key] = (sprite, expires_at)
+            self._images.move_to_end(key)
+            while len(self._images) > self.size:
+                self._images.popitem(last=False)
+        return sprite
+    
+    def _decode(self, data: bytes, width: int) -> Optional[Image.Image]:
+        try:
+            with Image.open(BytesIO(data)) as asset:
+                asset = asset.convert('RGBA')
+        except OSError as e:
+            logger.warning("Invalid emoji sprite: %s", e)
+            return None
+        # Same sizing as Pilmoji
+        size = width, math.ceil(asset.height / asset.width * width)
+        return asset.resize(size, Image.Resampling.LANCZOS)
+
+
+_emoji_cache = None
+_emoji_cache_lock = threading.Lock()
+
+
+def get_emoji_cache() -> EmojiCache:
+    """Process-wide emoji cache"""
+    global _emoji_cache
+    with _emoji_cache_lock:
+        if _emoji_cache is None:
+            store = EmojiStore(config.EMOJI_DIR or None, config.EMOJI_FETCH_URL or None, config.EMOJI_TIMEOUT)
+            _emoji_cache = EmojiCache(store, size=config.EMOJI_CACHE_SIZE, retry_seconds=config.EMOJI_RETRY)
+        return _emoji_cache
+
+
+def draw_text(img: Image.Image, xy: tuple, text: str, fill, font: ImageFont.FreeTypeFont):
+    """Draw a line of text, with emoji drawn from the local sprite cache
+    
+    Text without emoji goes straight to ImageDraw.text. Otherwise the text
+    is laid out like Pilmoji does it: each emoji is replaced by spaces of
+    the same width, the text is drawn once and the sprites are pasted over.
+    """
+    draw = ImageDraw.Draw(img)
+    if not EMOJI_REGEX.search(text):
+        draw.text(xy, text, fill=fill, font=font)
+        return
+    
+    cache = get_emoji_cache()
+    width = round(font.size)
+    space = draw.textlength(" ", font)
+    line_spacing = draw.textbbox((0, 0), "A", font)[3] + 4
+    x, y = xy
+    for line in to_nodes(text):
+        # Text with room left for the emoji
+        sprites = [cache.get(node.type, node.content, width) if node.type is not NodeType.text else None
+                   for node in line]
+        text_line = ''.join(
+            " " * round(width / space) if sprite is not None else node.content
+            for node, sprite in zip(line, sprites)
+        )
+        if text_line:
+            draw.text((x, y), text_line, fill=fill, font=font)
+        
+        # Sprites go where the ink of the drawn text starts
+        left, top = font.getbbox(text_line)[:2] if text_line else (0, 0)
+        node_x, node_y = int(x) + left, int(y) + top
+        for node, sprite in zip(line, sprites):
+            if sprite is None:
+                node_x += int(font.getlength(node.content))
+                continue
+            img.paste(sprite, (round(node_x), round(node_y)), sprite)
+            node_x += width
+        y += line_spacing
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when the render queue has no free slots"""
+
+
+class RenderExecutor:
+    """Bounded worker pool that runs blocking render jobs off the event loop"""
+    RETRY_INTERVAL = 0.05  # Seconds between attempts while waiting for a slot
+    
+    def __init__(self, kind: str = "thread", workers: int = 4, max_queue: int = 32, initializer=None):
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        elif kind == "thread":
+            # Threads share the process, so warm-up state is shared too
+            if initializer:
+                initializer()
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        else:
+            raise ValueError(f"Unknown render executor: {kind}")
+        
+        # Running jobs plus jobs waiting for a worker
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+    
+    def submit(self, fn, *args) -> Future:
+        """Submit job, raise QueueFullError if queue is full"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Render queue is full")
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    async def run(self, fn, *args, wait: bool = False):
+        """Run job in pool and await its result
+        
+        With wait, a full queue is retried until a slot frees up instead of
+        raising QueueFullError. For jobs of an already accepted batch.
+        """
+        while True:
+            try:
+                future = self.submit(fn, *args)
+            except QueueFullError:
+                if not wait:
+                    raise
+                await asyncio.sleep(self.RETRY_INTERVAL)
+                continue
+            return await asyncio.wrap_future(future)
+    
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
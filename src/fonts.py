@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import Optional
+from PIL import ImageFont
+from src import config
+import os
+
+
+@lru_cache(maxsize=None)
+def load_font(path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+    """Load font file once per process"""
+    return ImageFont.truetype(path, size, index=index)
+
+
+@lru_cache(maxsize=None)
+def font_path() -> Optional[str]:
+    """First configured font that exists and can be loaded"""
+    for path in config.FONT_PATHS:
+        if os.path.exists(path):
+            try:
+                load_font(path, 12, config.FONT_INDEX)
+                return path
+            except OSError:
+                continue
+    return None
+
+
+@lru_cache(maxsize=None)
+def _default_font(size: int) -> ImageFont.ImageFont:
+    return ImageFont.load_default()
+
+
+def get_font(size: int) -> ImageFont.FreeTypeFont:
+    """Shared font with Japanese support, falls back to Pillow default"""
+    path = font_path()
+    if path:
+        return load_font(path, size, config.FONT_INDEX)
+    return _default_font(size)
+
+
+@lru_cache(maxsize=None)
+def get_font_properties():
+    """Shared matplotlib FontProperties for the configured font"""
+    path = font_path()
+    if path is None:
+        return None
+    from matplotlib.font_manager import FontProperties
+    return FontProperties(fname=path)
+
+
+def warm_up(sizes):
+    """Load fonts ahead of the first render"""
+    for size in sizes:
+        get_font(size)
+    get_font_properties()
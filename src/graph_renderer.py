@@ -1,44 +1,65 @@
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import matplotlib.style
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from PIL import Image
-from io import BytesIO
+from collections import OrderedDict
+from typing import Optional
 from src.models import GraphData
-import os
+from src.fonts import get_font_properties
+from src.pillow_graph_renderer import PillowGraphRenderer
+from src.downsample import reduce_series
+from src import config
+import hashlib
+import json
+import threading
+
+STYLE = 'seaborn-v0_8-darkgrid'
+
+# Larger font sizes for vertical format
+VERTICAL_RC = {'font.size': 16, 'axes.labelsize': 18, 'xtick.labelsize': 16, 'ytick.labelsize': 16}
+
+# savefig's default pad_inches for bbox_inches='tight'
+TIGHT_PAD_INCHES = 0.1
+
+# rcParams are process-global, so only hold them while artists are created.
+# Drawing and encoding run outside the lock and can happen in parallel.
+_rc_lock = threading.Lock()
 
 
 class GraphRenderer:
     def __init__(self):
-        plt.style.use('seaborn-v0_8-darkgrid')
+        self.rc = dict(matplotlib.style.library[STYLE])
         
         # Set Japanese font for matplotlib
-        font_paths = [
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-            "C:\\Windows\\Fonts\\msgothic.ttc"
-        ]
+        self.jp_font = get_font_properties()
+        if self.jp_font:
+            self.rc['font.family'] = ['DejaVu Sans']
+    
+    def _build_figure(self, graph_data: GraphData, dpi: float) -> Figure:
+        """Create figure and all of its artists"""
+        fig = Figure(figsize=(8, 6), dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
         
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    plt.rcParams['font.family'] = ['DejaVu Sans']
-                    from matplotlib.font_manager import FontProperties
-                    self.jp_font = FontProperties(fname=font_path)
-                    break
-                except:
-                    continue
-        else:
-            self.jp_font = None
-        
-    def render_graph(self, graph_data: GraphData, vertical_format: bool = False) -> Image.Image:
-        """Render graph based on type"""
-        if vertical_format:
-            # Larger font sizes for vertical format
-            plt.rcParams.update({'font.size': 16, 'axes.labelsize': 18, 'xtick.labelsize': 16, 'ytick.labelsize': 16})
-        fig, ax = plt.subplots(figsize=(8, 6), dpi=100)
+        # Large series are reduced first, and their x labels thinned
+        series = reduce_series(graph_data)
+        max_labels = graph_data.max_labels or config.CHART_MAX_LABELS
+        dense = series.reduced or len(series.values) > max_labels
         
-        if graph_data.type == "bar":
+        if dense and graph_data.type in ("bar", "line"):
+            if graph_data.type == "bar":
+                ax.bar(series.x, series.values)
+                ax.set_xlabel('Categories', fontproperties=self.jp_font)
+                ax.set_ylabel('Values', fontproperties=self.jp_font)
+            else:
+                ax.plot(series.x, series.values, marker=None if series.reduced else 'o')
+                ax.set_xlabel('X-axis', fontproperties=self.jp_font)
+                ax.set_ylabel('Y-axis', fontproperties=self.jp_font)
+            positions, labels = series.ticks(max_labels)
+            ax.set_xticks(positions, [str(label) for label in labels], fontproperties=self.jp_font)
+        elif graph_data.type == "bar":
             ax.bar(graph_data.labels, graph_data.data)
             ax.set_xlabel('Categories', fontproperties=self.jp_font)
             ax.set_ylabel('Values', fontproperties=self.jp_font)
@@ -52,20 +73,150 @@ class GraphRenderer:
             if self.jp_font:
                 ax.set_xticklabels(graph_data.labels, fontproperties=self.jp_font)
         elif graph_data.type == "pie":
-            ax.pie(graph_data.data, labels=graph_data.labels, autopct='%1.1f%%')
+            if series.reduced:
+                ax.pie(series.values, labels=list(series.labels), autopct='%1.1f%%')
+            else:
+                ax.pie(graph_data.data, labels=graph_data.labels, autopct='%1.1f%%')
             ax.axis('equal')
             # Set Japanese font for pie chart labels
             if self.jp_font:
                 for text in ax.texts:
                     text.set_fontproperties(self.jp_font)
         
-        # Save to bytes
-        buf = BytesIO()
-        plt.savefig(buf, format='png', transparent=True, bbox_inches='tight')
-        buf.seek(0)
+        # Ticks are created lazily at draw time and read rcParams then,
+        # so create them while the style is active
+        for axis in (ax.xaxis, ax.yaxis):
+            axis.get_major_ticks(len(axis.get_majorticklocs()))
         
-        # Convert to PIL Image
-        img = Image.open(buf)
-        plt.close(fig)
+        return fig
+    
+    def render_graph(self, graph_data: GraphData, vertical_format: bool = False, scale: float = 1.0) -> Image.Image:
+        """Render graph based on type, scale sets the resolution (100 dpi at 1)"""
+        rc = dict(self.rc)
+        if vertical_format:
+            rc.update(VERTICAL_RC)
+        
+        with _rc_lock, matplotlib.rc_context(rc):
+            fig = self._build_figure(graph_data, 100 * scale)
+        
+        # Transparent background, like savefig(transparent=True)
+        fig.patch.set_facecolor('none')
+        for ax in fig.axes:
+            ax.patch.set_facecolor('none')
+        
+        # Hand the Agg RGBA buffer to PIL directly instead of a PNG round-trip
+        canvas = fig.canvas
+        canvas.draw()
+        width, height = canvas.get_width_height()
+        img = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        
+        # Tight crop in memory, like bbox_inches='tight' with the default padding
+        bbox = fig.get_tightbbox(canvas.get_renderer()).padded(TIGHT_PAD_INCHES)
+        left = round(bbox.x0 * fig.dpi)
+        top = round(height - bbox.y1 * fig.dpi)
+        right = left + int(bbox.width * fig.dpi)
+        bottom = top + int(bbox.height * fig.dpi)
+        img = img.crop((max(left, 0), max(top, 0), min(right, width), min(bottom, height)))
+        
+        return img
+
+
+_renderers = {}
+
+
+def get_graph_renderer(backend: str = None):
+    """Shared renderer for backend ("matplotlib" or "pillow")"""
+    backend = backend or config.CHART_BACKEND
+    renderer = _renderers.get(backend)
+    if renderer is None:
+        if backend == "pillow":
+            renderer = PillowGraphRenderer()
+        elif backend == "matplotlib":
+            renderer = GraphRenderer()
+        else:
+            raise ValueError(f"Unknown chart backend: {backend}")
+        _renderers[backend] = renderer
+    return renderer
+
+
+class ChartCache:
+    """Rendered charts keyed by chart hash, an LRU bounded by total bytes
+    
+    Images are shared between slides, callers must not modify them in place.
+    """
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
         
-        return img
\ No newline at end of file
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Image.Image]:
+        with self._lock:
+            img = self._images.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(key)
+            self.hits += 1
+            return img
+    
+    def put(self, key: str, img: Image.Image):
+        size = img.width * img.height * len(img.getbands())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._bytes -= old.width * old.height * len(old.getbands())
+            self._images[key] = img
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.width * evicted.height * len(evicted.getbands())
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._images), "bytes": self._bytes}
+
+
+def chart_key(graph_data: GraphData, vertical_format: bool, backend: str, scale: float) -> str:
+    """Cache key for a chart, the same data renders to the same image"""
+    payload = {
+        "graph": graph_data.model_dump(mode='json'),
+        "vertical": vertical_format,
+        "backend": backend,
+        "scale": scale
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+_chart_cache = None
+_chart_cache_lock = threading.Lock()
+
+
+def get_chart_cache() -> ChartCache:
+    """Process-wide chart cache"""
+    global _chart_cache
+    with _chart_cache_lock:
+        if _chart_cache is None:
+            _chart_cache = ChartCache(max_bytes=config.CHART_CACHE_MAX_MB * 1024 * 1024)
+        return _chart_cache
+
+
+def render_chart(graph_data: GraphData, vertical_format: bool = False, scale: float = 1.0) -> Image.Image:
+    """Chart for graph_data from the cache, rendered with its backend on a miss"""
+    backend = graph_data.backend or config.CHART_BACKEND
+    cache = get_chart_cache()
+    key = chart_key(graph_data, vertical_format, backend, scale)
+    img = cache.get(key)
+    if img is None:
+        img = get_graph_renderer(backend).render_graph(graph_data, vertical_format, scale)
+        cache.put(key, img)
+    return img
+
+
+def chart_cache_stats() -> dict:
+    return get_chart_cache().stats()
@@ -0,0 +1,168 @@
+from PIL import Image
+from io import BytesIO
+from collections import OrderedDict
+from typing import Optional
+from src import config
+import threading
+import time
+import requests
+
+
+class ImageTooLargeError(Exception):
+    """Raised when a remote image exceeds the byte or pixel limit"""
+
+
+def fit_size(size: tuple, box: tuple) -> tuple:
+    """Size after scaling down to fit inside box, keeping aspect ratio"""
+    scale = min(box[0] / size[0], box[1] / size[1], 1)
+    return max(int(size[0] * scale), 1), max(int(size[1] * scale), 1)
+
+
+def reducible(img: Image.Image) -> Image.Image:
+    """Image in a mode reduce() supports and can average
+    
+    Palette indices cannot be averaged, so palette images become RGB, or RGBA
+    when they have transparency.
+    """
+    if img.mode in ('P', 'PA'):
+        return img.convert('RGBA' if img.mode == 'PA' or 'transparency' in img.info else 'RGB')
+    if img.mode == '1':
+        return img.convert('L')
+    if img.mode.startswith('I;16'):
+        return img.convert('I')
+    return img
+
+
+def decode_image(data: bytes, box: tuple, max_pixels: int, max_dimension: Optional[int] = None) -> Image.Image:
+    """Decode image at the smallest power-of-two reduction that still covers box
+    
+    JPEGs are decoded at reduced scale with draft(), other formats are reduced
+    with reduce(). The caller does the final resample to its exact size. The
+    result is resized to fit max_dimension if it is still larger.
+    """
+    img = Image.open(BytesIO(data))
+    if img.width * img.height > max_pixels:
+        raise ImageTooLargeError(f"Image is {img.width}x{img.height}, limit is {max_pixels} pixels")
+    
+    target = fit_size(img.size, box)
+    img.draft(img.mode, target)
+    img.load()
+    
+    factor = 1
+    while img.width // (factor * 2) >= target[0] and img.height // (factor * 2) >= target[1]:
+        factor *= 2
+    if factor > 1:
+        img = reducible(img).reduce(factor)
+    if max_dimension and max(img.size) > max_dimension:
+        img = img.resize(fit_size(img.size, (max_dimension, max_dimension)), Image.Resampling.LANCZOS)
+    return img
+
+
+class CachedImage:
+    def __init__(self, image: Image.Image, etag: Optional[str], last_modified: Optional[str]):
+        self.image = image
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = time.monotonic()
+
+
+class ImageFetcher:
+    """Download remote images over a pooled session with an LRU of decoded images
+    
+    Entries are keyed by URL and target box and used without a request for
+    fresh_seconds. After that they are revalidated with conditional GETs
+    (ETag / Last-Modified), or fetched again when the origin sent neither.
+    Returned images are shared, callers must not modify them in place.
+    """
+    def __init__(self, cache_size: int = 32, max_bytes: int = 20 * 1024 * 1024,
+                 connect_timeout: float = 5.0, read_timeout: float = 15.0,
+                 max_dimension: int = 1920, fresh_seconds: float = 60.0,
+                 max_pixels: int = 50_000_000):
+        self.cache_size = cache_size
+        self.max_bytes = max_bytes
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_dimension = max_dimension
+        self.fresh_seconds = fresh_seconds
+        self.max_pixels = max_pixels
+        
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'data2slideimg/1.0'
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def fetch(self, url: str, box: Optional[tuple] = None) -> Image.Image:
+        """Decoded image for url, pre-reduced for drawing inside box
+        
+        The image is at least as large as its fit inside box (capped at
+        max_dimension), so the caller's final resize keeps full quality.
+        """
+        limit = self.max_dimension
+        box = (min(box[0], limit), min(box[1], limit)) if box else (limit, limit)
+        key = (url, box)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        
+        # Recently validated entries are used without a request
+        if cached is not None and time.monotonic() - cached.checked_at < self.fresh_seconds:
+            return cached.image
+        
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                cached.checked_at = time.monotonic()
+                return cached.image
+            response.raise_for_status()
+            data = self._read_body(response)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        
+        img = decode_image(data, box, self.max_pixels, limit)
+        
+        with self._lock:
+            self._cache[key] = CachedImage(img, etag, last_modified)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return img
+    
+    def _read_body(self, response: requests.Response) -> bytes:
+        """Read response body, refusing anything over max_bytes"""
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise ImageTooLargeError(f"Image is {length} bytes, limit is {self.max_bytes}")
+        
+        buf = BytesIO()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buf.write(chunk)
+            if buf.tell() > self.max_bytes:
+                raise ImageTooLargeError(f"Image exceeds {self.max_bytes} bytes")
+        return buf.getvalue()
+
+
+_image_fetcher = None
+_image_fetcher_lock = threading.Lock()
+
+
+def get_image_fetcher() -> ImageFetcher:
+    """Process-wide image fetcher"""
+    global _image_fetcher
+    with _image_fetcher_lock:
+        if _image_fetcher is None:
+            _image_fetcher = ImageFetcher(
+                cache_size=config.IMAGE_CACHE_SIZE,
+                max_bytes=config.IMAGE_MAX_BYTES,
+                connect_timeout=config.IMAGE_CONNECT_TIMEOUT,
+                read_timeout=config.IMAGE_READ_TIMEOUT,
+                max_dimension=config.IMAGE_MAX_DIMENSION,
+                fresh_seconds=config.IMAGE_CACHE_FRESH,
+                max_pixels=config.IMAGE_MAX_PIXELS
+            )
+        return _image_fetcher
@@ -1,21 +1,27 @@
 from PIL import Image, ImageDraw, ImageFilter
 from io import BytesIO
 import random
-import requests
 import os
-from src.models import SlideRequest, MapData
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from src.models import SlideRequest, TableData, MapData, OutputOptions
 from src.layout import LayoutEngine, VerticalLayoutEngine
-from src.graph_renderer import GraphRenderer
+from src.graph_renderer import render_chart
+from src.image_fetcher import get_image_fetcher
+from src.map_tiles import TileCache, get_tile_cache, placeholder_tile
+from src.render_cache import request_seed
+from src.fonts import get_font
+from src.text_wrap import wrap_text
+from src import config
 
 
-def download_image(url: str) -> Image.Image:
-    """Download image from URL"""
-    response = requests.get(url)
-    img = Image.open(BytesIO(response.content))
-    return img
+def download_image(url: str, box: tuple = None) -> Image.Image:
+    """Download image from URL, pre-reduced to fit box (cached, do not modify in place)"""
+    return get_image_fetcher().fetch(url, box)
 
 
-def generate_map_with_marker(map_data: MapData) -> Image.Image:
+def generate_map_with_marker(map_data: MapData, tile_cache: TileCache = None) -> Image.Image:
     """Generate map image with red marker at center"""
     # Use Stamen Terrain tiles (free, no API key required)
     # Alternative: a.tile.openstreetmap.org
@@ -34,21 +40,23 @@ def generate_map_with_marker(map_data: MapData) -> Image.Image:
     # Create base image
     map_img = Image.new('RGB', (map_data.width, map_data.height))
     
-    # Download and paste tiles
-    for dx in range(tiles_x):
-        for dy in range(tiles_y):
-            try:
-                # Using OSM tile server
-                tile_url = f"https://a.tile.openstreetmap.org/{map_data.zoom}/{xtile + dx - tiles_x//2}/{ytile + dy - tiles_y//2}.png"
-                response = requests.get(tile_url, headers={'User-Agent': 'data2slideimg/1.0'})
-                tile = Image.open(BytesIO(response.content))
-                
-                # Paste tile
-                x = dx * 256
-                y = dy * 256
-                map_img.paste(tile, (x, y))
-            except:
-                pass  # Skip failed tiles
+    # Load tiles concurrently through the shared cache
+    tile_keys = {
+        (dx, dy): (map_data.zoom, xtile + dx - tiles_x//2, ytile + dy - tiles_y//2)
+        for dx in range(tiles_x)
+        for dy in range(tiles_y)
+    }
+    tile_cache = tile_cache or get_tile_cache()
+    tiles = tile_cache.get_many(list(tile_keys.values()), timeout=config.TILE_DEADLINE)
+    
+    # Paste tiles, missing ones get a placeholder
+    placeholder = None
+    for (dx, dy), key in tile_keys.items():
+        tile = tiles[key]
+        if tile is None:
+            placeholder = placeholder or placeholder_tile()
+            tile = placeholder
+        map_img.paste(tile, (dx * 256, dy * 256))
     
     # Crop to exact size
     map_img = map_img.crop((0, 0, map_data.width, map_data.height))
@@ -87,72 +95,156 @@ def generate_map_with_marker(map_data: MapData) -> Image.Image:
     return map_img
 
 
-def generate_gradient_background(width: int, height: int, vibrant: bool = False) -> Image.Image:
-    """Generate random gradient background"""
-    img = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(img)
-    
+# Modern SNS-style gradients for vertical format - darker colors only
+VIBRANT_PALETTES = [
+    # S Tier - Professional SNS gradients
+    ((255, 45, 85), (255, 100, 45)),      # Instagram-style pink to orange
+    ((30, 150, 255), (0, 200, 200)),      # Twitter-style blue to cyan
+    ((150, 50, 255), (50, 200, 255)),     # TikTok-style purple to light blue
+    # Enhanced A Tier - Darker business gradients
+    ((220, 120, 0), (180, 80, 20)),       # Rich orange to dark orange
+    ((40, 160, 120), (20, 120, 80)),      # Deep green to forest green
+    ((200, 60, 60), (120, 40, 120)),      # Rich coral to deep purple
+]
+
+
+def _random_palette(rng: random.Random) -> tuple:
+    """Random colors - darker for better contrast with white text"""
+    color1 = (rng.randint(40, 120), rng.randint(40, 120), rng.randint(40, 120))
+    color2 = (rng.randint(20, 80), rng.randint(20, 80), rng.randint(20, 80))
+    return color1, color2
+
+
+# Fixed set of random palettes so their backgrounds stay in the cache
+_palette_rng = random.Random(0)
+RANDOM_PALETTES = [_random_palette(_palette_rng) for _ in range(config.GRADIENT_RANDOM_POOL)]
+
+
+@lru_cache(maxsize=config.GRADIENT_CACHE_SIZE)
+def _render_gradient(width: int, height: int, color1: tuple, color2: tuple) -> Image.Image:
+    """Render top-to-bottom gradient (cached, callers must copy)"""
+    # Compute one column, then stretch it to full width
+    column = bytearray()
+    for y in range(height):
+        ratio = y / height
+        column += bytes((
+            int(color1[0] * (1 - ratio) + color2[0] * ratio),
+            int(color1[1] * (1 - ratio) + color2[1] * ratio),
+            int(color1[2] * (1 - ratio) + color2[2] * ratio),
+        ))
+    strip = Image.frombytes('RGB', (1, height), bytes(column))
+    return strip.resize((width, height), Image.Resampling.NEAREST)
+
+
+def generate_gradient_background(width: int, height: int, vibrant: bool = False,
+                                 rng: random.Random = None) -> Image.Image:
+    """Generate random gradient background (palette picked with rng if given)"""
+    rng = rng or random
     if vibrant:
-        # Modern SNS-style gradients for vertical format - darker colors only
-        palettes = [
-            # S Tier - Professional SNS gradients
-            [(255, 45, 85), (255, 100, 45)],      # Instagram-style pink to orange  
-            [(30, 150, 255), (0, 200, 200)],      # Twitter-style blue to cyan
-            [(150, 50, 255), (50, 200, 255)],     # TikTok-style purple to light blue
-            # Enhanced A Tier - Darker business gradients
-            [(220, 120, 0), (180, 80, 20)],       # Rich orange to dark orange
-            [(40, 160, 120), (20, 120, 80)],      # Deep green to forest green
-            [(200, 60, 60), (120, 40, 120)],      # Rich coral to deep purple
-        ]
-        colors = random.choice(palettes)
-        color1, color2 = colors
+        color1, color2 = rng.choice(VIBRANT_PALETTES)
     else:
-        # Random colors - darker for better contrast with white text
-        color1 = (random.randint(40, 120), random.randint(40, 120), random.randint(40, 120))
-        color2 = (random.randint(20, 80), random.randint(20, 80), random.randint(20, 80))
+        color1, color2 = rng.choice(RANDOM_PALETTES)
     
-    # Create gradient
-    for y in range(height):
-        ratio = y / height
-        r = int(color1[0] * (1 - ratio) + color2[0] * ratio)
-        g = int(color1[1] * (1 - ratio) + color2[1] * ratio)
-        b = int(color1[2] * (1 - ratio) + color2[2] * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    return _render_gradient(width, height, color1, color2).copy()
+
+
+class SlideAssets:
+    """Futures for the slide inputs that can be prepared independently"""
+    def __init__(self):
+        self.image = None
+        self.map = None
+        self.graph = None
+
+
+_prepare_pool = None
+_prepare_pool_lock = threading.Lock()
+
+
+def _get_prepare_pool() -> ThreadPoolExecutor:
+    global _prepare_pool
+    with _prepare_pool_lock:
+        if _prepare_pool is None:
+            _prepare_pool = ThreadPoolExecutor(max_workers=config.PREPARE_WORKERS, thread_name_prefix="prepare")
+        return _prepare_pool
+
+
+def _skipped(*args) -> Future:
+    """Finished future without a result, stands in for assets in dry runs"""
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+def prepare_slide_assets(request: SlideRequest, image_box: tuple, vertical_format: bool = False,
+                         dry_run: bool = False) -> SlideAssets:
+    """Start image download, map tiles and chart rendering concurrently"""
+    submit = _skipped if dry_run else _get_prepare_pool().submit
+    assets = SlideAssets()
+    
+    # Priority: image > map, horizontal slides also drop the graph for them
+    if request.image:
+        assets.image = submit(download_image, request.image.url, image_box)
+    elif request.map:
+        assets.map = submit(generate_map_with_marker, request.map)
     
-    return img
+    if request.graph and (vertical_format or not (request.image or request.map)):
+        assets.graph = submit(render_chart, request.graph, vertical_format, request.scale)
+    
+    return assets
 
 
-def generate_slide_image(request: SlideRequest) -> bytes:
-    """Generate slide image from request data"""
-    width, height = 1920, 1080
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def encode_image(img: Image.Image, options: OutputOptions = None) -> bytes:
+    """Encode slide as PNG, WebP or JPEG"""
+    options = options or OutputOptions()
+    output = BytesIO()
+    if options.format == "webp":
+        img.save(output, format='WEBP', quality=options.quality or config.WEBP_QUALITY,
+                 lossless=options.lossless, method=0 if options.fast else 4)
+    elif options.format == "jpeg":
+        img.convert('RGB').save(output, format='JPEG', quality=options.quality or config.JPEG_QUALITY,
+                                optimize=not options.fast)
+    else:
+        if options.palette:
+            img = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        compress_level = options.compress_level
+        if compress_level is None:
+            compress_level = 1 if options.fast else 6
+        img.save(output, format='PNG', compress_level=compress_level)
+    return output.getvalue()
+
+
+def _compose_horizontal(request: SlideRequest, dry_run: bool = False) -> tuple:
+    """Lay out and draw horizontal slide, returns (image, layout engine)
     
-    # Create base image with gradient
-    img = generate_gradient_background(width, height)
+    A dry run lays out every element without fetching assets or drawing, so
+    the image is None.
+    """
+    width, height = round(1920 * request.scale), round(1080 * request.scale)
     
-    # Initialize layout engine
-    layout = LayoutEngine(width, height)
+    # Initialize layout engine, the title decides where the content starts
+    layout = LayoutEngine(width, height, request.scale)
+    if request.title:
+        layout.measure_title(request.title)
+    
+    # Fetch and render the left column while the text is drawn
+    assets = prepare_slide_assets(request, layout.image_box(), dry_run=dry_run)
+    
+    # Create base image with gradient
+    img = None
+    if not dry_run:
+        rng = random.Random(request_seed(request))
+        img = generate_gradient_background(width, height, rng=rng)
     
     # Draw title if exists
     if request.title:
         layout.draw_title(img, request.title)
     
     # New layout: image/graph left, text and table right
-    right_column_start = None
-    
-    # Priority: image > map > graph
-    if request.image:
-        # Download and draw image in left column
-        source_img = download_image(request.image.url)
-        right_column_start = layout.draw_image_left(img, source_img)
-    elif request.map:
-        # Generate and draw map in left column
-        source_img = generate_map_with_marker(request.map)
-        right_column_start = layout.draw_image_left(img, source_img)
-    elif request.graph:
-        # Draw graph in left column if no image
-        graph_renderer = GraphRenderer()
-        graph_img = graph_renderer.render_graph(request.graph)
-        right_column_start = layout.draw_graph_left(img, graph_img)
+    if assets.image or assets.map or assets.graph:
+        right_column_start = layout.right_column_start()
     else:
         # If no image or graph, use full width for text
         right_column_start = layout.margin
@@ -167,24 +259,30 @@ def generate_slide_image(request: SlideRequest) -> bytes:
     if request.table:
         layout.draw_table_right(img, request.table, right_column_start, text_end_y)
     
-    # Convert to bytes
-    output = BytesIO()
-    img.save(output, format='PNG')
-    return output.getvalue()
+    # Left column does not overlap the text, so it can be drawn last
+    if assets.image:
+        layout.draw_image_left(img, assets.image.result())
+    elif assets.map:
+        layout.draw_image_left(img, assets.map.result(), kind='map')
+    elif assets.graph:
+        layout.draw_graph_left(img, assets.graph.result())
+    
+    return img, layout
 
 
-def generate_vertical_slide_image(request: SlideRequest) -> bytes:
-    """Generate vertical slide image (stories format) from request data"""
-    width, height = 1080, 1920  # 9:16 aspect ratio
+def _compose_vertical(request: SlideRequest, dry_run: bool = False) -> tuple:
+    """Lay out and draw vertical slide (stories format), returns (image, layout engine)"""
+    width, height = round(1080 * request.scale), round(1920 * request.scale)  # 9:16 aspect ratio
     
-    # Create base image with vibrant gradient
-    img = generate_gradient_background(width, height, vibrant=True)
+    # Fetch background and render graph concurrently
+    assets = prepare_slide_assets(request, (width, height), vertical_format=True, dry_run=dry_run)
     
     # Use image or map as clean background if provided
-    has_image_background = False
-    if request.image:
+    img = None
+    background = assets.image or assets.map
+    if background and not dry_run:
         try:
-            bg_img = download_image(request.image.url)
+            bg_img = background.result()
             # Scale to fit entirely within canvas (letterbox/pillarbox)
             original_width, original_height = bg_img.size
             aspect_ratio = original_width / original_height
@@ -206,52 +304,25 @@ def generate_vertical_slide_image(request: SlideRequest) -> bytes:
             paste_x = (width - new_width) // 2
             paste_y = (height - new_height) // 2
             img.paste(bg_img, (paste_x, paste_y))
-            
-            has_image_background = True
-        except:
-            pass  # Use gradient only if image fails
-    elif request.map:
-        try:
-            # Generate map with marker as background
-            bg_img = generate_map_with_marker(request.map)
-            # Scale to fit entirely within canvas (letterbox/pillarbox)
-            original_width, original_height = bg_img.size
-            aspect_ratio = original_width / original_height
-            canvas_ratio = width / height
-            
-            if aspect_ratio > canvas_ratio:
-                # Map is wider - fit to width, add black bars top/bottom
-                new_width = width
-                new_height = int(width / aspect_ratio)
-            else:
-                # Map is taller - fit to height, add black bars left/right
-                new_height = height
-                new_width = int(height * aspect_ratio)
-            
-            bg_img = bg_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Create black background and paste centered
-            img = Image.new('RGB', (width, height), (0, 0, 0))
-            paste_x = (width - new_width) // 2
-            paste_y = (height - new_height) // 2
-            img.paste(bg_img, (paste_x, paste_y))
-            
-            has_image_background = True
-        except:
-            pass  # Use gradient only if map fails
+        except Exception:
+            pass  # Use gradient only if image or map fails
+    
+    has_image_background = img is not None
+    if img is None and not dry_run:
+        # Create base image with vibrant gradient
+        rng = random.Random(request_seed(request))
+        img = generate_gradient_background(width, height, vibrant=True, rng=rng)
     
     # Initialize vertical layout engine
-    layout = VerticalLayoutEngine(width, height)
+    layout = VerticalLayoutEngine(width, height, request.scale)
     
     # Draw title with glassmorphism effect
     if request.title:
         layout.draw_title_overlay(img, request.title, has_image_background)
     
     # Draw graph/data card if exists
-    if request.graph:
-        graph_renderer = GraphRenderer()
-        graph_img = graph_renderer.render_graph(request.graph, vertical_format=True)
-        layout.draw_graph_card(img, graph_img, has_image_background)
+    if assets.graph:
+        layout.draw_graph_card(img, assets.graph.result(), has_image_background)
     
     # Draw text blocks as cards
     if request.textBlocks:
@@ -262,7 +333,120 @@ def generate_vertical_slide_image(request: SlideRequest) -> bytes:
     if request.table:
         layout.draw_table_card(img, request.table, has_image_background)
     
-    # Convert to bytes
-    output = BytesIO()
-    img.save(output, format='PNG')
-    return output.getvalue()
\ No newline at end of file
+    return img, layout
+
+
+def compose_slide_image(request: SlideRequest) -> Image.Image:
+    """Compose horizontal slide from request data"""
+    return _compose_horizontal(request)[0]
+
+
+def compose_vertical_slide_image(request: SlideRequest) -> Image.Image:
+    """Compose vertical slide (stories format) from request data"""
+    return _compose_vertical(request)[0]
+
+
+def generate_slide_image(request: SlideRequest) -> bytes:
+    """Generate slide image from request data"""
+    return encode_image(compose_slide_image(request))
+
+
+def generate_vertical_slide_image(request: SlideRequest) -> bytes:
+    """Generate vertical slide image (stories format) from request data"""
+    return encode_image(compose_vertical_slide_image(request))
+
+
+def compose_slide(request: SlideRequest) -> Image.Image:
+    """Compose slide in the format requested"""
+    if request.format == "vertical":
+        return compose_vertical_slide_image(request)
+    return compose_slide_image(request)
+
+
+def layout_slide(request: SlideRequest) -> dict:
+    """Element geometry of the slide, from the renderer's own layout code
+    
+    Nothing is drawn and no images, maps or charts are loaded; their boxes
+    are the full slot they would be fitted into.
+    """
+    compose = _compose_vertical if request.format == "vertical" else _compose_horizontal
+    _, layout = compose(request, dry_run=True)
+    return {
+        "width": layout.width,
+        "height": layout.height,
+        "overflow": any(element['overflow'] for element in layout.elements),
+        "elements": layout.elements
+    }
+
+
+def paginate_slide(request: SlideRequest) -> list:
+    """The slide followed by continuation slides for table rows that do not fit
+    
+    Only tables with `paginate` are split. Continuation slides repeat the
+    title and background and carry only the table. Every page gets the seed
+    of the full request, so all share the background of the unsplit slide.
+    """
+    if not request.table or not request.table.paginate:
+        return [request]
+    
+    table = request.table
+    rows = table.rows
+    seed = request_seed(request)
+    current = request.model_copy(update={'seed': seed})
+    pages = []
+    while True:
+        shown = next(e for e in reversed(layout_slide(current)["elements"]) if e['type'] == 'table')['rows']
+        # A table-only slide always takes a row, so the loop ends
+        if pages:
+            shown = max(shown, 1)
+        pages.append(current.model_copy(update={'table': table.model_copy(update={'rows': rows[:shown]})}))
+        rows = rows[shown:]
+        if not rows:
+            return pages
+        current = SlideRequest(
+            title=request.title,
+            table=TableData(headers=table.headers, rows=rows),
+            format=request.format,
+            seed=seed,
+            scale=request.scale
+        )
+
+
+def paginate_deck(requests: list) -> list:
+    """Deck with continuation slides inserted after paginated tables"""
+    return [page for request in requests for page in paginate_slide(request)]
+
+
+def render_slide(request: SlideRequest, options: OutputOptions = None) -> bytes:
+    """Generate slide image in the format requested"""
+    return encode_image(compose_slide(request), options)
+
+
+def render_deck_page(request: SlideRequest) -> tuple:
+    """Slide as (JPEG bytes, width, height) for a PDF page"""
+    img = compose_slide(request)
+    jpeg = encode_image(img, OutputOptions(format="jpeg", quality=config.DECK_JPEG_QUALITY))
+    return jpeg, img.width, img.height
+
+
+def render_error_page(request: SlideRequest, index: int, error: str) -> tuple:
+    """Page saying the slide failed, as (JPEG bytes, width, height) of the slide's size"""
+    if request.format == "vertical":
+        width, height = round(1080 * request.scale), round(1920 * request.scale)
+    else:
+        width, height = round(1920 * request.scale), round(1080 * request.scale)
+    img = Image.new('RGB', (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    
+    margin = round(80 * request.scale)
+    title_font = get_font(max(1, round(64 * request.scale)))
+    body_font = get_font(max(1, round(36 * request.scale)))
+    y = margin
+    draw.text((margin, y), f"Slide {index + 1} could not be rendered", fill=(180, 30, 30), font=title_font)
+    y += round(title_font.size * 1.6)
+    for line in wrap_text(error, body_font, width - 2 * margin):
+        draw.text((margin, y), line, fill=(60, 60, 60), font=body_font)
+        y += round(body_font.size * 1.4)
+    
+    jpeg = encode_image(img, OutputOptions(format="jpeg", quality=config.DECK_JPEG_QUALITY))
+    return jpeg, width, height
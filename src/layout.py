@@ -1,126 +1,136 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from typing import Optional
 from src.models import TableData
-from pilmoji import Pilmoji
-import os
+from src.emoji import draw_text
+from src.text_effects import draw_outlined_text
+from src.table import plan_table
+from src.text_wrap import wrap_text, measure_text
+from src.fonts import get_font, warm_up
 
 
-class LayoutEngine:
-    def __init__(self, width: int, height: int):
+class BaseLayoutEngine:
+    """Scaling and element bookkeeping shared by the layout engines
+    
+    Every draw_* method records the boxes it lays out in `elements` before
+    drawing. With img=None only the layout runs, which is what /layout uses.
+    """
+    def __init__(self, width: int, height: int, scale: float = 1.0):
         self.width = width
         self.height = height
-        self.margin = 80
+        self.scale = scale  # Layout constants are given at full size
+        self.elements = []
+    
+    def px(self, value: int) -> int:
+        """Full-size length at the engine's scale"""
+        return round(value * self.scale)
+    
+    def record(self, kind: str, box: tuple, overflow: bool = False, **info):
+        """Note an element's box, flagged as overflowing if it leaves the canvas"""
+        x1, y1, x2, y2 = box
+        overflow = overflow or x1 < 0 or y1 < 0 or x2 > self.width or y2 > self.height
+        self.elements.append({'type': kind, 'box': [x1, y1, x2, y2], 'overflow': overflow, **info})
+
+
+class LayoutEngine(BaseLayoutEngine):
+    font_sizes = {'title': 72, 'text': 36, 'table': 24}
+    
+    def __init__(self, width: int, height: int, scale: float = 1.0):
+        super().__init__(width, height, scale)
+        self.margin = self.px(80)
         self.current_y = self.margin
         self.content_start_y = self.margin  # Start of content area after title
         
-        # Try to load Japanese font
-        self.font_paths = [
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-            "C:\\Windows\\Fonts\\msgothic.ttc"
-        ]
-        
-        self.title_font = self._load_font(72)
-        self.text_font = self._load_font(36)
-        self.table_font = self._load_font(24)
-        
-    def _load_font(self, size: int) -> ImageFont.FreeTypeFont:
-        """Load font with fallback"""
-        for font_path in self.font_paths:
-            if os.path.exists(font_path):
-                try:
-                    return ImageFont.truetype(font_path, size)
-                except:
-                    continue
-        # Fallback to default
-        return ImageFont.load_default()
+        # Shared fonts with Japanese support
+        self.title_font = get_font(self.px(self.font_sizes['title']))
+        self.text_font = get_font(self.px(self.font_sizes['text']))
+        self.table_font = get_font(self.px(self.font_sizes['table']))
     
-    def draw_title(self, img: Image.Image, title: str):
-        """Draw title at the top"""
-        draw = ImageDraw.Draw(img)
+    def measure_title(self, title: str) -> tuple:
+        """Reserve space for the title and return its box"""
+        # Calculate text size
+        bbox = self.title_font.getbbox(title)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
         
-        # Use Pilmoji for emoji support
-        with Pilmoji(img) as pilmoji:
-            # Calculate text size
-            bbox = draw.textbbox((0, 0), title, font=self.title_font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # Center horizontally
-            x = (self.width - text_width) // 2
-            y = self.margin
-            
-            # Draw text with shadow
-            pilmoji.text((x + 3, y + 3), title, fill=(0, 0, 0, 128), font=self.title_font)
-            pilmoji.text((x, y), title, fill=(255, 255, 255), font=self.title_font)
+        # Center horizontally
+        x = (self.width - text_width) // 2
+        y = self.margin
         
         self.current_y = y + text_height + self.margin
         self.content_start_y = self.current_y
+        return x, y, x + text_width, y + text_height
     
-    def draw_text_blocks_right(self, img: Image.Image, text_blocks: list, x_start: int):
+    def draw_title(self, img: Optional[Image.Image], title: str):
+        """Draw title at the top"""
+        box = self.measure_title(title)
+        x, y = box[0], box[1]
+        self.record('title', box, overflow=box[2] - box[0] > self.width - 2 * self.margin, lines=[title])
+        if img is None:
+            return
+        
+        # Draw text with shadow
+        draw_text(img, (x + self.px(3), y + self.px(3)), title, (0, 0, 0, 128), self.title_font)
+        draw_text(img, (x, y), title, (255, 255, 255), self.title_font)
+    
+    def draw_text_blocks_right(self, img: Optional[Image.Image], text_blocks: list, x_start: int):
         """Draw text blocks in right column"""
-        draw = ImageDraw.Draw(img)
         current_y = self.content_start_y
         right_width = self.width - x_start - self.margin
         
-        with Pilmoji(img) as pilmoji:
-            for text_block in text_blocks:
-                # Character-based wrap for Japanese text
-                lines = []
-                current_line = ""
-                
-                for char in text_block:
-                    test_line = current_line + char
-                    bbox = draw.textbbox((0, 0), test_line, font=self.text_font)
-                    if bbox[2] - bbox[0] > right_width:
-                        if current_line:
-                            lines.append(current_line)
-                            current_line = char
-                        else:
-                            lines.append(char)
-                    else:
-                        current_line = test_line
-                
-                if current_line:
-                    lines.append(current_line)
-                
-                # Draw lines
-                for line in lines:
-                    pilmoji.text((x_start, current_y), line, fill=(255, 255, 255), font=self.text_font)
-                    current_y += 50
-                
-                current_y += 30
+        # Position every line first
+        placed = []
+        for text_block in text_blocks:
+            lines = wrap_text(text_block, self.text_font, right_width)
+            block_top = current_y
+            for line in lines:
+                placed.append((current_y, line))
+                current_y += self.px(50)
+            self.record('text', (x_start, block_top, x_start + right_width, current_y), lines=lines)
+            
+            current_y += self.px(30)
+        
+        if img is None:
+            return current_y
+        
+        # Draw lines
+        for line_y, line in placed:
+            draw_text(img, (x_start, line_y), line, (255, 255, 255), self.text_font)
         
         return current_y
     
-    def draw_graph_left(self, img: Image.Image, graph_img: Image.Image):
-        """Draw graph image in left column"""
+    def draw_graph_left(self, img: Optional[Image.Image], graph_img: Optional[Image.Image]):
+        """Draw graph image in left column (the whole slot when graph_img is None)"""
         # Left column dimensions
         left_width = (self.width - 3 * self.margin) // 2
         available_height = self.height - self.content_start_y - self.margin
         
         # Calculate graph size to fit left column
-        graph_width = min(graph_img.width, left_width)
-        graph_height = min(graph_img.height, available_height)
-        
-        # Maintain aspect ratio
-        aspect_ratio = graph_img.width / graph_img.height
-        if graph_width / graph_height > aspect_ratio:
-            graph_width = int(graph_height * aspect_ratio)
+        if graph_img is None:
+            graph_width, graph_height = left_width, available_height
         else:
-            graph_height = int(graph_width / aspect_ratio)
-        
-        # Resize graph
-        graph_img = graph_img.resize((graph_width, graph_height), Image.Resampling.LANCZOS)
+            graph_width = min(graph_img.width, left_width)
+            graph_height = min(graph_img.height, available_height)
+            
+            # Maintain aspect ratio
+            aspect_ratio = graph_img.width / graph_img.height
+            if graph_width / graph_height > aspect_ratio:
+                graph_width = int(graph_height * aspect_ratio)
+            else:
+                graph_height = int(graph_width / aspect_ratio)
         
         # Position in left column
         x = self.margin
         y = self.content_start_y
+        self.record('graph', (x, y, x + graph_width, y + graph_height), overflow=available_height <= 0)
+        if img is None or graph_img is None:
+            return self.margin + left_width + self.margin
+        
+        # Resize graph
+        graph_img = graph_img.resize((graph_width, graph_height), Image.Resampling.LANCZOS)
         
         # Draw gray background for graph
         draw = ImageDraw.Draw(img)
-        padding = 20
+        padding = self.px(20)
         bg_x1 = x - padding
         bg_y1 = y - padding
         bg_x2 = x + graph_width + padding
@@ -133,33 +143,49 @@ class LayoutEngine:
         # Return right column start position
         return self.margin + left_width + self.margin
     
-    def draw_image_left(self, img: Image.Image, source_img: Image.Image):
-        """Draw image in left column"""
-        # Left column dimensions
+    def image_box(self) -> tuple:
+        """Largest size an image can take in the left column"""
         left_width = (self.width - 3 * self.margin) // 2
         available_height = self.height - self.content_start_y - self.margin
+        return left_width, available_height
+    
+    def right_column_start(self) -> int:
+        """X position of the right column when the left column is used"""
+        left_width = (self.width - 3 * self.margin) // 2
+        return self.margin + left_width + self.margin
+    
+    def draw_image_left(self, img: Optional[Image.Image], source_img: Optional[Image.Image], kind: str = 'image'):
+        """Draw image in left column (the whole slot when source_img is None)"""
+        # Left column dimensions
+        left_width, available_height = self.image_box()
         
         # Calculate image size to fit left column
-        img_width = min(source_img.width, left_width)
-        img_height = min(source_img.height, available_height)
-        
-        # Maintain aspect ratio
-        aspect_ratio = source_img.width / source_img.height
-        if img_width / img_height > aspect_ratio:
-            img_width = int(img_height * aspect_ratio)
+        if source_img is None:
+            img_width, img_height = left_width, available_height
         else:
-            img_height = int(img_width / aspect_ratio)
-        
-        # Resize image
-        source_img = source_img.resize((img_width, img_height), Image.Resampling.LANCZOS)
+            img_width = min(source_img.width, left_width)
+            img_height = min(source_img.height, available_height)
+            
+            # Maintain aspect ratio
+            aspect_ratio = source_img.width / source_img.height
+            if img_width / img_height > aspect_ratio:
+                img_width = int(img_height * aspect_ratio)
+            else:
+                img_height = int(img_width / aspect_ratio)
         
         # Position in left column
         x = self.margin
         y = self.content_start_y
+        self.record(kind, (x, y, x + img_width, y + img_height), overflow=available_height <= 0)
+        if img is None or source_img is None:
+            return self.margin + left_width + self.margin
+        
+        # Resize image
+        source_img = source_img.resize((img_width, img_height), Image.Resampling.LANCZOS)
         
         # Draw gray background for image
         draw = ImageDraw.Draw(img)
-        padding = 20
+        padding = self.px(20)
         bg_x1 = x - padding
         bg_y1 = y - padding
         bg_x2 = x + img_width + padding
@@ -172,199 +198,147 @@ class LayoutEngine:
         # Return right column start position
         return self.margin + left_width + self.margin
     
-    def draw_table_right(self, img: Image.Image, table: TableData, x_start: int, y_start: int):
-        """Draw table in right column"""
-        draw = ImageDraw.Draw(img)
-        
+    def draw_table_right(self, img: Optional[Image.Image], table: TableData, x_start: int, y_start: int):
+        """Draw table in right column, rows below the canvas are left out"""
         # Calculate cell dimensions for right column
-        num_cols = len(table.headers)
         right_width = self.width - x_start - self.margin
-        cell_width = right_width // num_cols
-        cell_height = 50
+        cell_height = self.px(50)
+        padding = self.px(12)
+        
+        y = y_start + self.px(30)  # Add some space before table
         
-        y = y_start + 30  # Add some space before table
+        # Column widths and the rows that fit above the bottom margin
+        plan = plan_table(table, self.table_font, right_width, self.height - self.margin - y, cell_height, padding)
+        self.record('table', (x_start, y, x_start + plan.width, y + (len(plan.rows) + 1) * cell_height),
+                    overflow=plan.clipped or plan.hidden > 0, rows=len(plan.rows), columns=len(plan.widths),
+                    hidden_rows=plan.hidden)
+        if img is None:
+            return
+        
+        draw = ImageDraw.Draw(img)
         
         # Draw header
-        for i, header in enumerate(table.headers):
-            x = x_start + i * cell_width
+        x = x_start
+        for header, cell_width in zip(plan.header, plan.widths):
             # Draw cell background
-            draw.rectangle([x, y, x + cell_width, y + cell_height], 
+            draw.rectangle([x, y, x + cell_width, y + cell_height],
                          fill=(50, 50, 50, 200), outline=(255, 255, 255, 128))
             # Draw text
-            bbox = draw.textbbox((0, 0), header, font=self.table_font)
-            text_width = bbox[2] - bbox[0]
-            text_x = x + (cell_width - text_width) // 2
-            draw.text((text_x, y + 12), header, fill=(255, 255, 255), font=self.table_font)
+            text_x = x + (cell_width - round(measure_text(self.table_font, header))) // 2
+            draw.text((text_x, y + padding), header, fill=(255, 255, 255), font=self.table_font)
+            x += cell_width
         
         y += cell_height
         
         # Draw rows
-        for row in table.rows:
-            for i, cell in enumerate(row):
-                x = x_start + i * cell_width
+        for row in plan.rows:
+            x = x_start
+            for cell, cell_width in zip(row, plan.widths):
                 # Draw cell
-                draw.rectangle([x, y, x + cell_width, y + cell_height], 
+                draw.rectangle([x, y, x + cell_width, y + cell_height],
                              outline=(255, 255, 255, 128))
                 # Draw text
-                bbox = draw.textbbox((0, 0), cell, font=self.table_font)
-                text_width = bbox[2] - bbox[0]
-                text_x = x + (cell_width - text_width) // 2
-                draw.text((text_x, y + 12), cell, fill=(255, 255, 255), font=self.table_font)
+                text_x = x + (cell_width - round(measure_text(self.table_font, cell))) // 2
+                draw.text((text_x, y + padding), cell, fill=(255, 255, 255), font=self.table_font)
+                x += cell_width
             y += cell_height
 
 
-class VerticalLayoutEngine:
+class VerticalLayoutEngine(BaseLayoutEngine):
     """Layout engine for vertical (9:16) format with modern styling"""
-    def __init__(self, width: int, height: int):
-        self.width = width
-        self.height = height
-        self.margin = 60
-        self.card_margin = 40
-        self.current_y = 100  # Start with safe area for notch
-        
-        # Try to load Japanese font
-        self.font_paths = [
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-            "C:\\Windows\\Fonts\\msgothic.ttc"
-        ]
-        
-        self.title_font = self._load_font(140)  # Enhanced size for better readability
-        self.text_font = self._load_font(50)    # Increased size for mobile readability
-        self.table_font = self._load_font(36)
-        
-    def _load_font(self, size: int) -> ImageFont.FreeTypeFont:
-        """Load font with fallback"""
-        for font_path in self.font_paths:
-            if os.path.exists(font_path):
-                try:
-                    return ImageFont.truetype(font_path, size)
-                except:
-                    continue
-        return ImageFont.load_default()
+    # Larger title and text for mobile readability
+    font_sizes = {'title': 140, 'text': 50, 'table': 36}
+    
+    def __init__(self, width: int, height: int, scale: float = 1.0):
+        super().__init__(width, height, scale)
+        self.margin = self.px(60)
+        self.card_margin = self.px(40)
+        self.current_y = self.px(100)  # Start with safe area for notch
+        
+        # Shared fonts with Japanese support
+        self.title_font = get_font(self.px(self.font_sizes['title']))
+        self.text_font = get_font(self.px(self.font_sizes['text']))
+        self.table_font = get_font(self.px(self.font_sizes['table']))
     
     def draw_glassmorphism_rect(self, draw: ImageDraw.Draw, x1: int, y1: int, x2: int, y2: int, has_image_bg: bool = False):
         """Draw enhanced glassmorphism effect rectangle with better readability"""
+        border = max(1, self.px(3))
         if has_image_bg:
             # Much more opaque background for image backgrounds - enhanced readability
             draw.rectangle([x1, y1, x2, y2], fill=(0, 0, 0, 240))
             # Stronger border
-            draw.rectangle([x1, y1, x2, y2], outline=(255, 255, 255, 255), width=3)
+            draw.rectangle([x1, y1, x2, y2], outline=(255, 255, 255, 255), width=border)
         else:
             # Dark background for gradient backgrounds - maximum contrast with white text
             draw.rectangle([x1, y1, x2, y2], fill=(0, 0, 0, 200))
             # Stronger border
-            draw.rectangle([x1, y1, x2, y2], outline=(255, 255, 255, 255), width=3)
+            draw.rectangle([x1, y1, x2, y2], outline=(255, 255, 255, 255), width=border)
     
-    def draw_title_overlay(self, img: Image.Image, title: str, has_image_bg: bool = False):
+    def draw_title_overlay(self, img: Optional[Image.Image], title: str, has_image_bg: bool = False):
         """Draw title with overlay effect"""
-        draw = ImageDraw.Draw(img, 'RGBA')
-        
         # Wrap title if too long
-        max_width = self.width - 120  # Leave margin for padding
-        lines = []
-        
-        # Check if title contains Japanese characters
-        import re
-        has_japanese = bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]', title))
-        
-        if has_japanese:
-            # Character-based wrapping for Japanese
-            current_line = ""
-            for char in title:
-                test_line = current_line + char
-                bbox = draw.textbbox((0, 0), test_line, font=self.title_font)
-                if bbox[2] - bbox[0] > max_width:
-                    if current_line:
-                        lines.append(current_line)
-                        current_line = char
-                    else:
-                        lines.append(char)
-                else:
-                    current_line = test_line
-            
-            if current_line:
-                lines.append(current_line)
-        else:
-            # Word-based wrapping for English
-            words = title.split(' ')
-            current_line = ""
-            
-            for word in words:
-                test_line = current_line + (' ' if current_line else '') + word
-                bbox = draw.textbbox((0, 0), test_line, font=self.title_font)
-                if bbox[2] - bbox[0] > max_width:
-                    if current_line:
-                        lines.append(current_line)
-                        current_line = word
-                    else:
-                        lines.append(word)
-                else:
-                    current_line = test_line
-            
-            if current_line:
-                lines.append(current_line)
+        max_width = self.width - self.px(120)  # Leave margin for padding
+        lines = wrap_text(title, self.title_font, max_width)
         
         # Calculate total height with improved spacing
-        line_height = 160
-        total_height = len(lines) * line_height - 20  # Enhanced line spacing for readability
+        line_height = self.px(160)
+        total_height = len(lines) * line_height - self.px(20)  # Enhanced line spacing for readability
         
         # Center position
         y = self.current_y
-        padding = 40
+        padding = self.px(40)
+        box = (self.margin - padding, y - padding, self.width - self.margin + padding, y + total_height + padding)
+        self.record('title', box, lines=lines)
+        self.current_y = y + total_height + padding * 2 + self.px(40)
+        if img is None:
+            return
         
-        # Draw glassmorphism background
-        self.draw_glassmorphism_rect(
-            draw,
-            60 - padding,
-            y - padding,
-            self.width - 60 + padding,
-            y + total_height + padding,
-            has_image_bg
-        )
-        
-        # Draw text with shadow and outline using Pilmoji
-        with Pilmoji(img) as pilmoji:
-            text_y = y
-            for line in lines:
-                # Calculate line width for centering
-                bbox = draw.textbbox((0, 0), line, font=self.title_font)
-                line_width = bbox[2] - bbox[0]
-                x = (self.width - line_width) // 2
-                
-                # Black outline
-                for dx, dy in [(-2,-2), (-2,2), (2,-2), (2,2), (-2,0), (2,0), (0,-2), (0,2)]:
-                    pilmoji.text((x + dx, text_y + dy), line, fill=(0, 0, 0, 255), font=self.title_font)
-                # Shadow
-                pilmoji.text((x + 4, text_y + 4), line, fill=(0, 0, 0, 180), font=self.title_font)
-                # Main text
-                pilmoji.text((x, text_y), line, fill=(255, 255, 255), font=self.title_font)
-                text_y += line_height
+        draw = ImageDraw.Draw(img, 'RGBA')
         
-        self.current_y = y + total_height + padding * 2 + 40
+        # Draw glassmorphism background
+        self.draw_glassmorphism_rect(draw, *box, has_image_bg)
+        
+        # Draw text with shadow and outline
+        text_y = y
+        for line in lines:
+            # Calculate line width for centering
+            bbox = draw.textbbox((0, 0), line, font=self.title_font)
+            line_width = bbox[2] - bbox[0]
+            x = (self.width - line_width) // 2
+            
+            # Black outline, shadow and main text from one glyph mask
+            d = self.px(2)
+            draw_outlined_text(img, (x, text_y), line, (255, 255, 255), self.title_font,
+                               outline=(0, 0, 0, 255),
+                               offsets=[(-d,-d), (-d,d), (d,-d), (d,d), (-d,0), (d,0), (0,-d), (0,d)],
+                               shadow=(self.px(4), self.px(4)), shadow_fill=(0, 0, 0, 180))
+            text_y += line_height
     
-    def draw_graph_card(self, img: Image.Image, graph_img: Image.Image, has_image_bg: bool = False):
+    def draw_graph_card(self, img: Optional[Image.Image], graph_img: Optional[Image.Image], has_image_bg: bool = False):
         """Draw graph in a card with glassmorphism"""
-        draw = ImageDraw.Draw(img, 'RGBA')
-        
         # Card dimensions
         card_width = self.width - 2 * self.card_margin
-        card_height = 400
-        
-        # Draw chart-specific background (light for readability)
+        card_height = self.px(400)
         card_x = self.card_margin
         card_y = self.current_y
+        self.record('graph', (card_x, card_y, card_x + card_width, card_y + card_height))
+        self.current_y = card_y + card_height + self.px(40)
+        if img is None or graph_img is None:
+            return
+        
+        draw = ImageDraw.Draw(img, 'RGBA')
+        
+        # Draw chart-specific background (light for readability)
         # Light background for charts regardless of image background
-        draw.rectangle([card_x, card_y, card_x + card_width, card_y + card_height], 
+        draw.rectangle([card_x, card_y, card_x + card_width, card_y + card_height],
                       fill=(255, 255, 255, 240))
         # Border
-        draw.rectangle([card_x, card_y, card_x + card_width, card_y + card_height], 
-                      outline=(255, 255, 255, 255), width=3)
+        draw.rectangle([card_x, card_y, card_x + card_width, card_y + card_height],
+                      outline=(255, 255, 255, 255), width=max(1, self.px(3)))
         
         # Resize graph to fit card
-        graph_width = card_width - 40
-        graph_height = card_height - 40
+        graph_width = card_width - self.px(40)
+        graph_height = card_height - self.px(40)
         aspect_ratio = graph_img.width / graph_img.height
         
         if graph_width / graph_height > aspect_ratio:
@@ -380,42 +354,29 @@ class VerticalLayoutEngine:
         
         # Paste graph
         img.paste(graph_img, (graph_x, graph_y), graph_img if graph_img.mode == 'RGBA' else None)
-        
-        self.current_y = card_y + card_height + 40
     
-    def draw_text_cards(self, img: Image.Image, text_blocks: list, has_image_bg: bool = False):
+    def draw_text_cards(self, img: Optional[Image.Image], text_blocks: list, has_image_bg: bool = False):
         """Draw text blocks as individual cards"""
-        draw = ImageDraw.Draw(img, 'RGBA')
+        draw = ImageDraw.Draw(img, 'RGBA') if img is not None else None
         
         for text_block in text_blocks:
             # Wrap text
-            lines = []
-            current_line = ""
             card_width = self.width - 2 * self.card_margin
-            text_width = card_width - 60
-            
-            for char in text_block:
-                test_line = current_line + char
-                bbox = draw.textbbox((0, 0), test_line, font=self.text_font)
-                if bbox[2] - bbox[0] > text_width:
-                    if current_line:
-                        lines.append(current_line)
-                        current_line = char
-                    else:
-                        lines.append(char)
-                else:
-                    current_line = test_line
-            
-            if current_line:
-                lines.append(current_line)
+            text_width = card_width - self.px(60)
+            lines = wrap_text(text_block, self.text_font, text_width)
             
             # Calculate card height
-            line_height = 60
-            card_height = len(lines) * line_height + 60
+            line_height = self.px(60)
+            card_height = len(lines) * line_height + self.px(60)
             
-            # Draw card
             card_x = self.card_margin
             card_y = self.current_y
+            self.record('text', (card_x, card_y, card_x + card_width, card_y + card_height), lines=lines)
+            self.current_y = card_y + card_height + self.px(30)
+            if img is None:
+                continue
+            
+            # Draw card
             self.draw_glassmorphism_rect(
                 draw,
                 card_x,
@@ -425,33 +386,43 @@ class VerticalLayoutEngine:
                 has_image_bg
             )
             
-            # Draw text with Pilmoji and outline
-            with Pilmoji(img) as pilmoji:
-                text_y = card_y + 30
-                for line in lines:
-                    # Black outline
-                    for dx, dy in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-                        pilmoji.text((card_x + 30 + dx, text_y + dy), line, fill=(0, 0, 0, 255), font=self.text_font)
-                    # Main text
-                    pilmoji.text((card_x + 30, text_y), line, fill=(255, 255, 255), font=self.text_font)
-                    text_y += line_height
-            
-            self.current_y = card_y + card_height + 30
+            # Draw text with outline
+            text_x = card_x + self.px(30)
+            text_y = card_y + self.px(30)
+            for line in lines:
+                # Black outline and main text from one glyph mask
+                d = self.px(1)
+                draw_outlined_text(img, (text_x, text_y), line, (255, 255, 255), self.text_font,
+                                   outline=(0, 0, 0, 255), offsets=[(-d,-d), (-d,d), (d,-d), (d,d)])
+                text_y += line_height
     
-    def draw_table_card(self, img: Image.Image, table: TableData, has_image_bg: bool = False):
-        """Draw table in a card"""
-        draw = ImageDraw.Draw(img, 'RGBA')
-        
+    def draw_table_card(self, img: Optional[Image.Image], table: TableData, has_image_bg: bool = False):
+        """Draw table in a card, rows below the canvas are left out"""
         # Calculate table dimensions
-        num_cols = len(table.headers)
-        num_rows = len(table.rows) + 1  # +1 for header
         card_width = self.width - 2 * self.card_margin
-        cell_height = 60
-        card_height = num_rows * cell_height + 60
+        cell_height = self.px(60)
+        padding = self.px(15)
         
-        # Draw card
+        # Table position within card
         card_x = self.card_margin
         card_y = self.current_y
+        table_x = card_x + self.px(30)
+        table_y = card_y + self.px(30)
+        table_width = card_width - self.px(60)
+        
+        # Column widths and the rows that fit above the bottom margin
+        available_height = self.height - self.margin - self.px(30) - table_y
+        plan = plan_table(table, self.table_font, table_width, available_height, cell_height, padding)
+        card_height = (len(plan.rows) + 1) * cell_height + self.px(60)
+        self.record('table', (card_x, card_y, card_x + card_width, card_y + card_height),
+                    overflow=plan.clipped or plan.hidden > 0, rows=len(plan.rows), columns=len(plan.widths),
+                    hidden_rows=plan.hidden)
+        if img is None:
+            return
+        
+        draw = ImageDraw.Draw(img, 'RGBA')
+        
+        # Draw card
         self.draw_glassmorphism_rect(
             draw,
             card_x,
@@ -461,15 +432,9 @@ class VerticalLayoutEngine:
             has_image_bg
         )
         
-        # Table position within card
-        table_x = card_x + 30
-        table_y = card_y + 30
-        table_width = card_width - 60
-        cell_width = table_width // num_cols
-        
         # Draw header
-        for i, header in enumerate(table.headers):
-            x = table_x + i * cell_width
+        x = table_x
+        for header, cell_width in zip(plan.header, plan.widths):
             # Header background
             draw.rectangle(
                 [x, table_y, x + cell_width, table_y + cell_height],
@@ -477,25 +442,29 @@ class VerticalLayoutEngine:
                 outline=(255, 255, 255, 100)
             )
             # Header text
-            bbox = draw.textbbox((0, 0), header, font=self.table_font)
-            text_width = bbox[2] - bbox[0]
-            text_x = x + (cell_width - text_width) // 2
-            draw.text((text_x, table_y + 15), header, fill=(255, 255, 255), font=self.table_font)
+            text_x = x + (cell_width - round(measure_text(self.table_font, header))) // 2
+            draw.text((text_x, table_y + padding), header, fill=(255, 255, 255), font=self.table_font)
+            x += cell_width
         
         table_y += cell_height
         
         # Draw rows
-        for row in table.rows:
-            for i, cell in enumerate(row):
-                x = table_x + i * cell_width
+        for row in plan.rows:
+            x = table_x
+            for cell, cell_width in zip(row, plan.widths):
                 # Cell border
                 draw.rectangle(
                     [x, table_y, x + cell_width, table_y + cell_height],
                     outline=(255, 255, 255, 60)
                 )
                 # Cell text
-                bbox = draw.textbbox((0, 0), cell, font=self.table_font)
-                text_width = bbox[2] - bbox[0]
-                text_x = x + (cell_width - text_width) // 2
-                draw.text((text_x, table_y + 15), cell, fill=(255, 255, 255), font=self.table_font)
-            table_y += cell_height
\ No newline at end of file
+                text_x = x + (cell_width - round(measure_text(self.table_font, cell))) // 2
+                draw.text((text_x, table_y + padding), cell, fill=(255, 255, 255), font=self.table_font)
+                x += cell_width
+            table_y += cell_height
+
+
+def warm_up_fonts():
+    """Load every font the layout engines use"""
+    for engine in (LayoutEngine, VerticalLayoutEngine):
+        warm_up(engine.font_sizes.values())
@@ -1,19 +1,289 @@
-from fastapi import FastAPI
-from fastapi.responses import Response
-from src.models import SlideRequest
-from src.image_generator import generate_slide_image, generate_vertical_slide_image
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from src.models import SlideRequest, OutputOptions
+from src.image_generator import render_slide, render_deck_page, render_error_page, layout_slide, paginate_deck, MEDIA_TYPES
+from src.layout import warm_up_fonts
+from src.graph_renderer import chart_cache_stats
+from src.executor import RenderExecutor, QueueFullError
+from src.render_cache import get_render_cache, request_key, content_etag
+from src.archive import PdfStream, ZipStream
+from src import config
+import asyncio
 import json
+import logging
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+executor = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global executor
+    executor = RenderExecutor(
+        config.RENDER_EXECUTOR,
+        config.RENDER_WORKERS,
+        config.RENDER_MAX_QUEUE,
+        initializer=warm_up_fonts
+    )
+    yield
+    executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full(request: Request, exc: QueueFullError):
+    """503 with Retry-After from any endpoint that finds the render queue full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Render queue is full"},
+        headers={"Retry-After": str(config.RENDER_RETRY_AFTER)}
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Output format preferred by an Accept header, PNG unless another ranks higher"""
+    formats = {media_type: name for name, media_type in MEDIA_TYPES.items()}
+    best, best_q = "png", 0.0
+    for part in (accept or "").split(','):
+        media_type, _, params = part.partition(';')
+        name = formats.get(media_type.strip().lower())
+        if name is None:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    pass
+        if q > best_q or (q == best_q and name == "png"):
+            best, best_q = name, q
+    return best
+
+
+def cache_lookup(request: SlideRequest, options: OutputOptions = None) -> tuple:
+    """Cache key and cached slide (or None) for a request"""
+    key = request_key(request, options)
+    return key, get_render_cache().get(key)
+
+
+async def render_cached(request: SlideRequest, options: OutputOptions = None, wait: bool = False) -> bytes:
+    """Rendered slide from the cache, or from the worker pool
+    
+    Hashing the request and the disk tier run in a thread, so large requests
+    do not block the event loop. With wait, a full render queue is waited
+    out instead of raising QueueFullError.
+    """
+    # Repeated requests are served from the cache without a render slot
+    key, image_bytes = await asyncio.to_thread(cache_lookup, request, options)
+    if image_bytes is None:
+        image_bytes = await executor.run(render_slide, request, options, wait=wait)
+        await asyncio.to_thread(get_render_cache().put, key, image_bytes)
+    return image_bytes
 
 
 @app.post("/generate")
-async def generate_slide(request: SlideRequest):
-    if request.format == "vertical":
-        image_bytes = generate_vertical_slide_image(request)
-    else:
-        image_bytes = generate_slide_image(request)
-    return Response(content=image_bytes, media_type="image/png")
+async def generate_slide(
+    request: SlideRequest,
+    output: Optional[Literal["png", "webp", "jpeg"]] = None,
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    lossless: bool = False,
+    compress_level: Optional[int] = Query(None, ge=0, le=9),
+    palette: bool = False,
+    fast: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    # ?output= wins over the Accept header
+    options = OutputOptions(
+        format=output or negotiate_format(accept),
+        quality=quality,
+        lossless=lossless,
+        compress_level=compress_level,
+        palette=palette,
+        fast=fast
+    )
+    image_bytes = await render_cached(request, options)
+    
+    headers = {"ETag": content_etag(image_bytes), "Vary": "Accept"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image_bytes, media_type=MEDIA_TYPES[options.format], headers=headers)
+
+
+async def stream_batch(requests: List[dict]):
+    """Render slides concurrently and yield a ZIP as they finish
+    
+    Each slide is validated on its own, so invalid slides are listed in
+    manifest.json along with failed ones instead of failing the batch.
+    Slides wait for a render slot when other traffic fills the queue.
+    """
+    # Leave room in the render queue for other clients
+    limit = asyncio.Semaphore(max(1, min(config.RENDER_WORKERS, len(requests))))
+    
+    async def render_one(index: int, item: dict):
+        async with limit:
+            try:
+                request = SlideRequest.model_validate(item)
+                return index, await render_cached(request, wait=True), None
+            except Exception as e:
+                logger.warning("Batch slide %d failed: %s", index, e)
+                return index, None, f"{type(e).__name__}: {e}"
+    
+    tasks = [asyncio.create_task(render_one(i, item)) for i, item in enumerate(requests)]
+    archive = ZipStream()
+    manifest = [None] * len(requests)
+    try:
+        for task in asyncio.as_completed(tasks):
+            index, image_bytes, error = await task
+            if error is not None:
+                manifest[index] = {"index": index, "error": error}
+                continue
+            name = f"slide-{index + 1:03d}.png"
+            manifest[index] = {"index": index, "file": name}
+            yield archive.add(name, image_bytes)
+        
+        yield archive.add("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+        yield archive.close()
+    finally:
+        # Client went away, drop slides that have not started
+        for task in tasks:
+            task.cancel()
+
+
+def check_batch_size(requests: list):
+    if len(requests) > config.BATCH_MAX_SLIDES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(requests)} slides, limit is {config.BATCH_MAX_SLIDES}"
+        )
+
+
+@app.post("/generate/batch")
+async def generate_batch(requests: List[dict]):
+    check_batch_size(requests)
+    return StreamingResponse(
+        stream_batch(requests),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="slides.zip"'}
+    )
+
+
+async def render_in_order(render, requests: List[SlideRequest]):
+    """Yield (index, result, error) in request order, rendering a window ahead
+    
+    At most RENDER_WORKERS slides are rendered or held at a time, so memory
+    does not grow with the deck length. Slides wait for a render slot when
+    other traffic fills the queue.
+    """
+    async def render_one(index: int, request: SlideRequest):
+        try:
+            return index, await render(request), None
+        except Exception as e:
+            logger.warning("Deck slide %d failed: %s", index, e)
+            return index, None, f"{type(e).__name__}: {e}"
+    
+    pending = deque()
+    upcoming = iter(enumerate(requests))
+    
+    def schedule():
+        item = next(upcoming, None)
+        if item is not None:
+            pending.append(asyncio.create_task(render_one(*item)))
+    
+    try:
+        for _ in range(max(1, config.RENDER_WORKERS)):
+            schedule()
+        while pending:
+            result = await pending.popleft()
+            schedule()
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_pdf_deck(requests: List[SlideRequest]):
+    """Multi-page PDF, one page per slide written as soon as it is rendered
+    
+    Failed slides are replaced by a page with the error, so page numbers
+    still match the request.
+    """
+    pdf = PdfStream()
+    render = lambda request: executor.run(render_deck_page, request, wait=True)
+    async for index, page, error in render_in_order(render, requests):
+        if error is not None:
+            page = await asyncio.to_thread(render_error_page, requests[index], index, error)
+        yield pdf.add_page(*page)
+    yield pdf.close()
+
+
+async def stream_zip_deck(requests: List[SlideRequest]):
+    """ZIP of PNGs in deck order, failed slides are listed in manifest.json"""
+    archive = ZipStream()
+    manifest = []
+    async for index, image_bytes, error in render_in_order(lambda request: render_cached(request, wait=True), requests):
+        if error is not None:
+            manifest.append({"index": index, "error": error})
+            continue
+        name = f"slide-{index + 1:03d}.png"
+        manifest.append({"index": index, "file": name})
+        yield archive.add(name, image_bytes)
+    yield archive.add("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield archive.close()
+
+
+@app.post("/generate/deck")
+async def generate_deck(requests: List[SlideRequest], deck_type: Literal["pdf", "zip"] = Query("pdf", alias="type")):
+    check_batch_size(requests)
+    if any(request.table and request.table.paginate for request in requests):
+        # Continuation slides count towards the limit
+        requests = await executor.run(paginate_deck, requests)
+        check_batch_size(requests)
+    if deck_type == "zip":
+        return StreamingResponse(
+            stream_zip_deck(requests),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="deck.zip"'}
+        )
+    return StreamingResponse(
+        stream_pdf_deck(requests),
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="deck.pdf"'}
+    )
+
+
+@app.post("/layout")
+async def layout(request: SlideRequest):
+    """Element boxes, wrapped lines and overflow flags without rendering"""
+    return await executor.run(layout_slide, request)
+
+
+@app.get("/stats")
+async def stats():
+    """Chart cache hit/miss counters
+    
+    Process workers each keep their own cache, so with the process executor
+    these are the counters of the worker that answered.
+    """
+    if config.RENDER_EXECUTOR != "process":
+        return {"chart_cache": chart_cache_stats()}
+    return {"chart_cache": await executor.run(chart_cache_stats)}
 
 
 @app.get("/.well-known/schemas/slide-generator.json")
@@ -0,0 +1,235 @@
+from PIL import Image
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Optional
+from src.disk_cache import DiskCache
+from src import config
+import logging
+import os
+import sqlite3
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+
+# Shown where a tile is missing (OSM land color)
+PLACEHOLDER_COLOR = (242, 239, 233)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session sized for the tile workers"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers['User-Agent'] = 'data2slideimg/1.0'
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=config.TILE_FETCH_WORKERS
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+class HttpTileSource:
+    """Tiles from a tile server such as OpenStreetMap"""
+    def __init__(self, url_template: str):
+        self.url_template = url_template
+    
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        url = self.url_template.format(z=z, x=x, y=y)
+        try:
+            response = get_session().get(url, timeout=config.TILE_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        except requests.RequestException as e:
+            logger.warning("Failed to fetch tile %s: %s", url, e)
+            return None
+
+
+class MBTilesTileSource:
+    """Tiles from an MBTiles (SQLite) file, opened read-only and memory-mapped"""
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._local = threading.local()
+    
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections are per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            conn.execute(f"PRAGMA mmap_size={config.MBTILES_MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+    
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        # MBTiles rows use TMS numbering (origin at the bottom)
+        tms_y = (1 << z) - 1 - y
+        try:
+            row = self._connection().execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, tms_y)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Failed to read tile %s/%s/%s from %s: %s", z, x, y, self.path, e)
+            return None
+        return row[0] if row else None
+
+
+class DirectoryTileSource:
+    """Tiles from a {z}/{x}/{y}.png directory tree"""
+    def __init__(self, root: str):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(root)
+        self.root = root
+    
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, str(z), str(x), f"{y}.png"), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+def create_tile_source(spec: str):
+    """Create tile source from config (http, mbtiles:<file> or dir:<directory>)"""
+    kind, _, location = spec.partition(':')
+    if kind == "http":
+        return HttpTileSource(config.TILE_URL_TEMPLATE)
+    if kind == "mbtiles":
+        return MBTilesTileSource(location)
+    if kind == "dir":
+        return DirectoryTileSource(location)
+    raise ValueError(f"Unknown tile source: {spec}")
+
+
+class TileCache:
+    """Tile cache keyed by (z, x, y) with an in-memory LRU and a disk tier
+    
+    Concurrent requests for the same tile share a single fetch.
+    """
+    def __init__(self, fetch, memory_size: int = 256, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.fetch = fetch
+        self.memory_size = memory_size
+        self.disk = DiskCache(disk_dir, disk_max_bytes, ttl) if disk_dir else None
+        
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+    
+    def get(self, z: int, x: int, y: int) -> Optional[Image.Image]:
+        """Decoded tile, or None if it could not be loaded"""
+        key = (z, x, y)
+        with self._lock:
+            tile = self._memory.get(key)
+            if tile is not None:
+                self._memory.move_to_end(key)
+                return tile
+            
+            # Join a fetch already in progress for this tile
+            future = self._inflight.get(key)
+            if future is not None:
+                owner = False
+            else:
+                future = self._inflight[key] = Future()
+                owner = True
+        
+        if not owner:
+            return future.result()
+        
+        tile = None
+        try:
+            tile = self._load(key)
+        finally:
+            with self._lock:
+                if tile is not None:
+                    self._memory[key] = tile
+                    while len(self._memory) > self.memory_size:
+                        self._memory.popitem(last=False)
+                del self._inflight[key]
+            future.set_result(tile)
+        return tile
+    
+    def get_many(self, keys: list, timeout: Optional[float] = None) -> dict:
+        """Load tiles concurrently, tiles not ready within timeout are None
+        
+        Unfinished fetches keep running and fill the cache for later requests.
+        """
+        futures = {key: _get_tile_pool().submit(self.get, *key) for key in set(keys)}
+        wait(futures.values(), timeout=timeout)
+        return {
+            key: future.result() if future.done() else None
+            for key, future in futures.items()
+        }
+    
+    def _load(self, key: tuple) -> Optional[Image.Image]:
+        """Decoded tile, any failure to fetch or decode counts as a missing tile"""
+        try:
+            data = self.disk.read(self._disk_name(key)) if self.disk else None
+            if data is None:
+                data = self.fetch(*key)
+                if data is None:
+                    return None
+                if self.disk:
+                    self.disk.write(self._disk_name(key), data)
+        except Exception as e:
+            logger.warning("Failed to load tile %s: %s", key, e)
+            return None
+        
+        try:
+            tile = Image.open(BytesIO(data))
+            tile.load()
+        except Exception as e:
+            # Also DecompressionBombError, which is not an OSError
+            logger.warning("Invalid tile %s: %s", key, e)
+            return None
+        return tile
+    
+    def _disk_name(self, key: tuple) -> str:
+        z, x, y = key
+        return os.path.join(str(z), str(x), f"{y}.png")
+
+
+_tile_pool = None
+_tile_cache = None
+_tile_cache_lock = threading.Lock()
+
+
+def _get_tile_pool() -> ThreadPoolExecutor:
+    global _tile_pool
+    with _tile_cache_lock:
+        if _tile_pool is None:
+            _tile_pool = ThreadPoolExecutor(max_workers=config.TILE_FETCH_WORKERS, thread_name_prefix="tiles")
+        return _tile_pool
+
+
+def placeholder_tile() -> Image.Image:
+    return Image.new('RGB', (TILE_SIZE, TILE_SIZE), PLACEHOLDER_COLOR)
+
+
+def get_tile_cache() -> TileCache:
+    """Process-wide tile cache"""
+    global _tile_cache
+    with _tile_cache_lock:
+        if _tile_cache is None:
+            source = create_tile_source(config.TILE_SOURCE)
+            # Local sources are already on disk
+            disk_dir = config.TILE_CACHE_DIR if isinstance(source, HttpTileSource) else None
+            _tile_cache = TileCache(
+                source.get_tile,
+                memory_size=config.TILE_MEMORY_CACHE_SIZE,
+                disk_dir=disk_dir or None,
+                disk_max_bytes=config.TILE_CACHE_MAX_MB * 1024 * 1024,
+                ttl=config.TILE_CACHE_TTL
+            )
+        return _tile_cache
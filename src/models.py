@@ -1,5 +1,5 @@
 from typing import List, Optional, Literal
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class TextBlock(BaseModel):
@@ -10,11 +10,18 @@ class GraphData(BaseModel):
     type: Literal["bar", "line", "pie"]
     data: List[float]
     labels: List[str]
+    backend: Optional[Literal["matplotlib", "pillow"]] = None  # Chart backend (default: CHART_BACKEND)
+    max_points: Optional[int] = Field(None, ge=3)  # Line charts are downsampled above this (default: CHART_MAX_POINTS)
+    downsample: Literal["lttb", "minmax", "none"] = "lttb"  # Line chart downsampling method
+    max_categories: Optional[int] = Field(None, ge=2)  # Bar/pie categories incl. other (default: CHART_MAX_CATEGORIES)
+    other_label: str = "Other"  # Label of the summed smaller categories
+    max_labels: Optional[int] = Field(None, ge=1)  # X axis labels shown (default: CHART_MAX_LABELS)
 
 
 class TableData(BaseModel):
     headers: List[str]
     rows: List[List[str]]
+    paginate: bool = False  # In decks, rows that do not fit continue on extra slides
 
 
 class ImageData(BaseModel):
@@ -30,6 +37,15 @@ class MapData(BaseModel):
     height: Optional[int] = 600  # Map image height
 
 
+class OutputOptions(BaseModel):
+    format: Literal["png", "webp", "jpeg"] = "png"
+    quality: Optional[int] = None  # WebP/JPEG quality 1-100 (default: WEBP_QUALITY / JPEG_QUALITY)
+    lossless: bool = False  # Lossless WebP
+    compress_level: Optional[int] = None  # PNG zlib level 0-9 (default: 6, 1 in fast mode)
+    palette: bool = False  # Quantize PNG to 256 colors
+    fast: bool = False  # Favor encode speed over file size
+
+
 class SlideRequest(BaseModel):
     title: Optional[str] = None
     textBlocks: Optional[List[TextBlock]] = None
@@ -37,4 +53,6 @@ class SlideRequest(BaseModel):
     table: Optional[TableData] = None
     image: Optional[ImageData] = None
     map: Optional[MapData] = None
-    format: Optional[Literal["horizontal", "vertical"]] = "horizontal"
\ No newline at end of file
+    format: Optional[Literal["horizontal", "vertical"]] = "horizontal"
+    seed: Optional[int] = None  # Background seed (default: derived from the request)
+    scale: float = Field(1.0, ge=0.1, le=2)  # Render size relative to full size, e.g. 0.25 for previews
\ No newline at end of file
@@ -0,0 +1,205 @@
+from PIL import Image, ImageDraw
+from src.models import GraphData
+from src.fonts import get_font
+from src.downsample import Series, reduce_series
+from src import config
+import math
+
+# matplotlib default color cycle (tab10)
+COLORS = [
+    (31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189),
+    (140, 86, 75), (227, 119, 194), (127, 127, 127), (188, 189, 34), (23, 190, 207),
+]
+
+# seaborn-darkgrid look, axes background is transparent like matplotlib's transparent=True
+GRID_COLOR = (255, 255, 255, 255)
+TEXT_COLOR = (38, 38, 38, 255)
+
+# Draw at 2x and downsample for antialiasing
+SUPERSAMPLE = 2
+
+
+def nice_ticks(vmin: float, vmax: float, max_ticks: int = 8) -> list:
+    """Round tick values covering [vmin, vmax], like matplotlib's MaxNLocator"""
+    if vmax <= vmin:
+        vmax = vmin + 1
+    raw_step = (vmax - vmin) / max_ticks
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    for multiple in (1, 2, 2.5, 5, 10):
+        step = multiple * magnitude
+        if step >= raw_step:
+            break
+    start = math.floor(vmin / step) * step
+    ticks = []
+    value = start
+    while value <= vmax + step * 1e-9:
+        if value >= vmin - step * 1e-9:
+            ticks.append(round(value, 10))
+        value += step
+    return ticks
+
+
+def format_tick(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return f"{value:g}"
+
+
+class PillowGraphRenderer:
+    """Draw bar/line/pie charts directly with ImageDraw (fast, lower fidelity)"""
+    def __init__(self):
+        self.width = 800
+        self.height = 600
+    
+    def _sizes(self, vertical_format: bool, s: float) -> dict:
+        # Pixel equivalents of matplotlib's point sizes at 100 dpi.
+        # Category and axis labels use the Japanese font at its default size.
+        if vertical_format:
+            sizes = {'tick': 22, 'category': 14, 'label': 14}
+        else:
+            sizes = {'tick': 14, 'category': 14, 'label': 14}
+        return {key: round(value * s) for key, value in sizes.items()}
+    
+    def render_graph(self, graph_data: GraphData, vertical_format: bool = False, scale: float = 1.0) -> Image.Image:
+        """Render graph based on type, scale sets the resolution (800x600 at 1)"""
+        # Drawing unit in canvas pixels per output pixel at full size
+        s = SUPERSAMPLE * scale
+        img = Image.new('RGBA', (round(self.width * s), round(self.height * s)), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        sizes = self._sizes(vertical_format, s)
+        
+        # Large series are reduced first, and their x labels thinned
+        series = reduce_series(graph_data)
+        max_labels = graph_data.max_labels or config.CHART_MAX_LABELS
+        
+        if graph_data.type == "bar":
+            self._draw_axes_chart(img, draw, series, max_labels, sizes, s, 'Categories', 'Values', bars=True)
+        elif graph_data.type == "line":
+            self._draw_axes_chart(img, draw, series, max_labels, sizes, s, 'X-axis', 'Y-axis', bars=False)
+        elif graph_data.type == "pie":
+            self._draw_pie(draw, series, sizes, s)
+        
+        # Tight crop with a small padding, then downsample with premultiplied alpha
+        bbox = img.getbbox()
+        if bbox:
+            pad = round(10 * s)
+            img = img.crop((max(bbox[0] - pad, 0), max(bbox[1] - pad, 0),
+                            min(bbox[2] + pad, img.width), min(bbox[3] + pad, img.height)))
+        return img.convert('RGBa').reduce(SUPERSAMPLE).convert('RGBA')
+    
+    def _draw_rotated_text(self, img: Image.Image, center: tuple, text: str, font):
+        """Draw text rotated 90 degrees counter-clockwise, centered on point"""
+        bbox = font.getbbox(text)
+        text_img = Image.new('RGBA', (bbox[2] - bbox[0], bbox[3] - bbox[1]), (0, 0, 0, 0))
+        ImageDraw.Draw(text_img).text((-bbox[0], -bbox[1]), text, fill=TEXT_COLOR, font=font)
+        text_img = text_img.rotate(90, expand=True)
+        img.alpha_composite(text_img, (int(center[0] - text_img.width / 2), int(center[1] - text_img.height / 2)))
+    
+    def _draw_axes_chart(self, img, draw, series: Series, max_labels: int, sizes: dict, s: float,
+                         xlabel: str, ylabel: str, bars: bool):
+        tick_font = get_font(sizes['tick'])
+        category_font = get_font(sizes['category'])
+        label_font = get_font(sizes['label'])
+        values = series.values.tolist()
+        count = max(series.count, 1)
+        
+        # Value range, bars always include zero
+        vmin = min(values) if values else 0
+        vmax = max(values) if values else 1
+        if bars:
+            vmin, vmax = min(vmin, 0), max(vmax, 0)
+        ticks = nice_ticks(vmin, vmax)
+        span = (vmax - vmin) or 1
+        if bars:
+            lo = vmin - (span * 0.05 if vmin < 0 else 0)
+            hi = vmax + (span * 0.05 if vmax > 0 else 0)
+        else:
+            lo, hi = vmin - span * 0.05, vmax + span * 0.05
+        ticks = [t for t in ticks if lo <= t <= hi]
+        
+        # Plot area
+        tick_labels = [format_tick(t) for t in ticks]
+        tick_width = max((draw.textlength(t, font=tick_font) for t in tick_labels), default=0)
+        label_height = sizes['label']
+        left = int(tick_width + label_height + 20 * s)
+        right = self.width * s - 10 * s
+        top = 10 * s
+        bottom = self.height * s - int(sizes['category'] + label_height + 20 * s)
+        
+        def y_pos(value):
+            return bottom - (value - lo) / ((hi - lo) or 1) * (bottom - top)
+        
+        # Horizontal grid and y tick labels
+        for tick, text in zip(ticks, tick_labels):
+            y = y_pos(tick)
+            draw.line([(left, y), (right, y)], fill=GRID_COLOR, width=max(1, round(s)))
+            draw.text((left - 5 * s, y), text, fill=TEXT_COLOR, font=tick_font, anchor='rm')
+        
+        # Category positions, reduced series keep their original spacing
+        slot = (right - left) / count
+        centers = [left + slot * (x + 0.5) for x in series.x.tolist()]
+        positions, labels = series.ticks(max_labels)
+        label_centers = [left + slot * (x + 0.5) for x in positions.tolist()]
+        
+        # Vertical grid at labeled categories, drawn below data
+        for x in label_centers:
+            draw.line([(x, top), (x, bottom)], fill=GRID_COLOR, width=max(1, round(s)))
+        
+        if bars:
+            bar_width = slot * 0.8
+            zero = y_pos(0)
+            for x, value in zip(centers, values):
+                y = y_pos(value)
+                draw.rectangle([x - bar_width / 2, min(y, zero), x + bar_width / 2, max(y, zero)], fill=COLORS[0])
+        else:
+            points = [(x, y_pos(value)) for x, value in zip(centers, values)]
+            if len(points) > 1:
+                draw.line(points, fill=COLORS[0], width=max(1, int(1.5 * 100 / 72 * s)), joint='curve')
+            # Markers only when every point is drawn
+            radius = 3 * 100 / 72 * s
+            for x, y in points if not series.reduced else []:
+                draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=COLORS[0])
+        
+        # X tick labels, skipping some when they would overlap
+        labels = [str(label) for label in labels]
+        spacing = (right - left) / max(len(labels), 1)
+        widths = [draw.textlength(label, font=category_font) for label in labels]
+        widest = max(widths, default=0) + 10 * s
+        step = max(1, math.ceil(widest / spacing)) if spacing else 1
+        for i, (x, label) in enumerate(zip(label_centers, labels)):
+            if i % step == 0:
+                draw.text((x, bottom + 5 * s), label, fill=TEXT_COLOR, font=category_font, anchor='ma')
+        
+        # Axis labels
+        draw.text(((left + right) / 2, bottom + sizes['category'] + 12 * s), xlabel,
+                  fill=TEXT_COLOR, font=label_font, anchor='ma')
+        self._draw_rotated_text(img, (left - tick_width - 10 * s - label_height / 2, (top + bottom) / 2),
+                                ylabel, label_font)
+    
+    def _draw_pie(self, draw, series: Series, sizes: dict, s: float):
+        font = get_font(sizes['tick'])
+        values = series.values.tolist()
+        total = sum(values) or 1
+        
+        # Leave room for the labels around the pie
+        cx = self.width * s / 2
+        cy = self.height * s / 2
+        radius = min(cx, cy) * 0.75
+        
+        # matplotlib starts at 3 o'clock and runs counter-clockwise,
+        # PIL angles run clockwise
+        angle = 0.0
+        for i, (value, label) in enumerate(zip(values, series.labels.tolist())):
+            sweep = value / total * 360
+            draw.pieslice([cx - radius, cy - radius, cx + radius, cy + radius],
+                          -(angle + sweep), -angle, fill=COLORS[i % len(COLORS)])
+            
+            middle = math.radians(angle + sweep / 2)
+            dx, dy = math.cos(middle), -math.sin(middle)
+            # Label outside the wedge, percentage inside
+            anchor = ('l' if dx >= 0 else 'r') + 'm'
+            draw.text((cx + dx * radius * 1.1, cy + dy * radius * 1.1), label,
+                      fill=TEXT_COLOR, font=font, anchor=anchor)
+            draw.text((cx + dx * radius * 0.6, cy + dy * radius * 0.6), f"{value / total * 100:.1f}%",
+                      fill=TEXT_COLOR, font=font, anchor='mm')
+            angle += sweep
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import Optional
+from pydantic import BaseModel
+from src.models import SlideRequest, OutputOptions
+from src.disk_cache import DiskCache
+from src import config
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump when rendering changes so cached slides are not reused
+RENDER_VERSION = 2
+
+# Fields that only change how content is fitted, left out of the background seed
+SEED_EXCLUDE = {
+    'scale': True,
+    'graph': {'max_points', 'downsample', 'max_categories', 'other_label', 'max_labels'},
+    'table': {'paginate'},
+}
+
+
+def _canonical(model: BaseModel, exclude=None) -> bytes:
+    """Model as JSON with sorted keys and no whitespace"""
+    payload = model.model_dump(mode='json', exclude=exclude)
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def request_key(request: SlideRequest, options: OutputOptions = None) -> str:
+    """Cache key for the rendered slide in the given output encoding"""
+    digest = hashlib.sha256(f"v{RENDER_VERSION}:".encode())
+    digest.update(_canonical(request))
+    digest.update(_canonical(options or OutputOptions()))
+    return digest.hexdigest()
+
+
+def request_seed(request: SlideRequest) -> int:
+    """Background seed, derived from the request unless given explicitly
+    
+    Scale and fitting options are left out, so previews, paginated tables and
+    downsampled charts get the same background as the full slide.
+    """
+    if request.seed is not None:
+        return request.seed
+    return int.from_bytes(hashlib.sha256(_canonical(request, exclude=SEED_EXCLUDE)).digest()[:8], 'big')
+
+
+def content_etag(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+class RenderCache:
+    """Rendered slides keyed by request hash, in memory and optionally on disk
+    
+    The memory tier is an LRU bounded by total bytes. Entries expire after ttl
+    seconds so remote images and map tiles are eventually picked up again.
+    """
+    def __init__(self, memory_max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024, ttl: float = 3600):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk = DiskCache(disk_dir, disk_max_bytes, ttl) if disk_dir else None
+        self.ttl = ttl
+        
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                data, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    return data
+                del self._memory[key]
+                self._memory_bytes -= len(data)
+        
+        data = self.disk.read(self._disk_name(key)) if self.disk else None
+        if data is not None:
+            self._put_memory(key, data)
+        return data
+    
+    def put(self, key: str, data: bytes):
+        self._put_memory(key, data)
+        if self.disk:
+            self.disk.write(self._disk_name(key), data)
+    
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old[0])
+            self._memory[key] = (data, time.monotonic())
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+    
+    def _disk_name(self, key: str) -> str:
+        return os.path.join(key[:2], key)
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Process-wide render cache"""
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache(
+                memory_max_bytes=config.RENDER_CACHE_MAX_MB * 1024 * 1024,
+                disk_dir=config.RENDER_CACHE_DIR or None,
+                disk_max_bytes=config.RENDER_CACHE_DISK_MAX_MB * 1024 * 1024,
+                ttl=config.RENDER_CACHE_TTL
+            )
+        return _render_cache
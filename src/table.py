@@ -0,0 +1,85 @@
+from PIL import ImageFont
+from src.models import TableData
+from src.text_wrap import measure_text
+
+ELLIPSIS = "…"
+
+
+def fit_text(text: str, font: ImageFont.FreeTypeFont, width: float) -> str:
+    """Text cut to the longest prefix that fits width with an ellipsis"""
+    if measure_text(font, text) <= width:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        middle = (lo + hi + 1) // 2
+        if measure_text(font, text[:middle].rstrip() + ELLIPSIS) <= width:
+            lo = middle
+        else:
+            hi = middle - 1
+    return text[:lo].rstrip() + ELLIPSIS if lo else ""
+
+
+def share_width(natural: list, available: int) -> list:
+    """Column widths from their content, filling exactly the available width
+    
+    When everything fits the spare width is spread evenly. Otherwise
+    narrow columns keep their natural width and the rest share what is left.
+    """
+    count = len(natural)
+    widths = [0] * count
+    remaining = available
+    if sum(natural) <= available:
+        extra = available - sum(natural)
+        for i in range(count):
+            widths[i] = natural[i] + extra // count + (1 if i < extra % count else 0)
+        return widths
+    
+    for k, i in enumerate(sorted(range(count), key=natural.__getitem__)):
+        widths[i] = min(natural[i], remaining // (count - k))
+        remaining -= widths[i]
+    return widths
+
+
+class TablePlan:
+    """Column widths and fitted cell text for the rows that fit"""
+    def __init__(self, widths: list, header: list, rows: list, hidden: int, clipped: bool):
+        self.widths = widths
+        self.header = header
+        self.rows = rows
+        self.hidden = hidden  # Rows left out for lack of height
+        self.clipped = clipped  # Some text was shortened
+    
+    @property
+    def width(self) -> int:
+        return sum(self.widths)
+
+
+def plan_table(table: TableData, font: ImageFont.FreeTypeFont, width: int, height: int,
+               cell_height: int, padding: int) -> TablePlan:
+    """Lay out the header and as many rows as fit in width x height
+    
+    Only the rows that are shown are measured, so the cost does not depend
+    on the size of the table. Rows are cut or padded to the header's column
+    count.
+    """
+    count = len(table.headers) or max((len(row) for row in table.rows), default=0)
+    if count == 0:
+        return TablePlan([], [], [], len(table.rows), False)
+    visible = max(0, (height - cell_height) // cell_height)
+    header = (list(table.headers) + [""] * count)[:count]
+    rows = [(list(row) + [""] * count)[:count] for row in table.rows[:visible]]
+    
+    # Widest text per column, each glyph measured once per font
+    natural = [0] * count
+    for cells in [header, *rows]:
+        for i, text in enumerate(cells):
+            natural[i] = max(natural[i], measure_text(font, text))
+    widths = share_width([int(w) + 1 + 2 * padding for w in natural], width)
+    
+    clipped = False
+    fitted = []
+    for cells in [header, *rows]:
+        line = [fit_text(text, font, w - 2 * padding) for text, w in zip(cells, widths)]
+        clipped = clipped or line != cells
+        fitted.append(line)
+    return TablePlan(widths, fitted[0], fitted[1:], len(table.rows) - len(rows), clipped)
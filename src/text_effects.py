@@ -0,0 +1,59 @@
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from typing import Optional
+from pilmoji.helpers import EMOJI_REGEX
+from src.emoji import draw_text
+
+
+def glyph_mask(text: str, font: ImageFont.FreeTypeFont, pad: int) -> tuple:
+    """Text rasterized once into an L mask with pad pixels around the ink
+    
+    Returns the mask and its offset from the text origin.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new('L', (right - left + 2 * pad, bottom - top + 2 * pad), 0)
+    ImageDraw.Draw(mask).text((pad - left, pad - top), text, fill=255, font=font)
+    return mask, (left - pad, top - pad)
+
+
+def outline_mask(mask: Image.Image, offsets: list) -> Image.Image:
+    """Union of the mask shifted by each offset
+    
+    Copies are combined with screen, which is how coverage adds up when
+    the same text is drawn repeatedly.
+    """
+    width, height = mask.size
+    union = None
+    for dx, dy in offsets:
+        # Cropping past the edges shifts the mask and fills with zeros
+        shifted = mask.crop((-dx, -dy, width - dx, height - dy))
+        union = shifted if union is None else ImageChops.screen(union, shifted)
+    return union
+
+
+def draw_outlined_text(img: Image.Image, xy: tuple, text: str, fill, font: ImageFont.FreeTypeFont,
+                       outline, offsets: list, shadow: Optional[tuple] = None, shadow_fill=None):
+    """Draw text over an outline made of offset copies, with an optional shadow
+    
+    The glyphs are rasterized once and the outline, shadow and text are
+    composited from that mask. Lines with emoji are drawn copy by copy,
+    since the sprites have to be pasted at each offset.
+    """
+    x, y = xy
+    if EMOJI_REGEX.search(text):
+        for dx, dy in offsets:
+            draw_text(img, (x + dx, y + dy), text, outline, font)
+        if shadow is not None:
+            draw_text(img, (x + shadow[0], y + shadow[1]), text, shadow_fill, font)
+        draw_text(img, xy, text, fill, font)
+        return
+    
+    shifts = [*offsets, *([shadow] if shadow is not None else [])]
+    pad = max((abs(v) for shift in shifts for v in shift), default=0)
+    mask, (left, top) = glyph_mask(text, font, pad)
+    origin = (x + left, y + top)
+    
+    if offsets:
+        img.paste(outline, origin, outline_mask(mask, offsets))
+    if shadow is not None:
+        img.paste(shadow_fill, (origin[0] + shadow[0], origin[1] + shadow[1]), mask)
+    img.paste(fill, origin, mask)
@@ -0,0 +1,124 @@
+import unicodedata
+from weakref import WeakKeyDictionary
+from PIL import ImageFont
+
+# Per-font glyph metrics: char -> (advance, ink left, ink right)
+_metrics_cache = WeakKeyDictionary()
+
+
+def _glyph_metrics(font: ImageFont.FreeTypeFont, char: str) -> tuple:
+    """Measure a single glyph once per font"""
+    cache = _metrics_cache.get(font)
+    if cache is None:
+        cache = _metrics_cache[font] = {}
+    metrics = cache.get(char)
+    if metrics is None:
+        bbox = font.getbbox(char)
+        metrics = cache[char] = (font.getlength(char), bbox[0], bbox[2])
+    return metrics
+
+
+def is_wide(char: str) -> bool:
+    """CJK and other full-width characters can break on either side"""
+    return unicodedata.east_asian_width(char) in ('W', 'F')
+
+
+def measure_text(font: ImageFont.FreeTypeFont, text: str) -> float:
+    """Approximate draw.textbbox width from cached glyph metrics"""
+    if not text:
+        return 0
+    advance = 0
+    for char in text[:-1]:
+        advance += _glyph_metrics(font, char)[0]
+    left = min(0, _glyph_metrics(font, text[0])[1])
+    return advance + _glyph_metrics(font, text[-1])[2] - left
+
+
+def _split_units(text: str) -> list:
+    """Split text into unbreakable units: Latin words, single wide chars and spaces"""
+    units = []
+    word = ""
+    for char in text:
+        if char == ' ' or is_wide(char):
+            if word:
+                units.append(word)
+                word = ""
+            units.append(char)
+        else:
+            word += char
+    if word:
+        units.append(word)
+    return units
+
+
+def _wrap_paragraph(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+    lines = []
+    line = ""
+    # Running state of the current line
+    advance = 0  # Sum of advances of all chars in line
+    first_left = 0  # Ink left of the first char
+
+    def width_with(char):
+        _, char_left, char_right = _glyph_metrics(font, char)
+        left = first_left if line else min(0, char_left)
+        return advance + char_right - left
+
+    def append(char):
+        nonlocal line, advance, first_left
+        char_advance, char_left, _ = _glyph_metrics(font, char)
+        if not line:
+            first_left = min(0, char_left)
+        line += char
+        advance += char_advance
+
+    def break_line():
+        nonlocal line, advance
+        lines.append(line.rstrip(' ') or line)
+        line = ""
+        advance = 0
+
+    for unit in _split_units(text):
+        if unit == ' ':
+            if line:
+                append(unit)
+            continue
+
+        # Width of the line with this unit appended, measured incrementally
+        unit_advance = sum(_glyph_metrics(font, char)[0] for char in unit[:-1])
+        unit_width = unit_advance + _glyph_metrics(font, unit[-1])[2]
+        left = first_left if line else min(0, _glyph_metrics(font, unit[0])[1])
+        if advance + unit_width - left <= max_width:
+            for char in unit:
+                append(char)
+            continue
+
+        if line:
+            break_line()
+
+        # Unit fits on a fresh line
+        if measure_text(font, unit) <= max_width:
+            for char in unit:
+                append(char)
+            continue
+
+        # Word longer than a full line: fall back to character wrapping
+        for char in unit:
+            if line and width_with(char) > max_width:
+                break_line()
+            append(char)
+
+    if line:
+        lines.append(line.rstrip(' ') or line)
+    return lines
+
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+    """Wrap text to max_width in a single pass
+
+    Wide (CJK) characters may break anywhere, Latin words break at spaces
+    and are only split when a single word is wider than the line.
+    """
+    lines = []
+    for paragraph in text.split('\n'):
+        lines.extend(_wrap_paragraph(paragraph, font, max_width))
+    return lines
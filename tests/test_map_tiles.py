@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src import config
+from src.map_tiles import TileCache, create_tile_source
+
+
+def png_tile() -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (256, 256), (200, 220, 240)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def tile_server(monkeypatch):
+    """Local stand-in tile server counting requests per path"""
+    data = png_tile()
+    hits = {}
+    lock = threading.Lock()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits[self.path] = hits.get(self.path, 0) + 1
+            # Slow enough for concurrent requests to overlap
+            time.sleep(0.2)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(config, 'TILE_URL_TEMPLATE', f"http://127.0.0.1:{server.server_port}/{{z}}/{{x}}/{{y}}.png")
+    yield hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_requests_fetch_once(tile_server):
+    cache = TileCache(create_tile_source("http").get_tile)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tiles = list(pool.map(lambda _: cache.get(3, 4, 5), range(8)))
+    
+    assert tile_server == {"/3/4/5.png": 1}
+    assert all(tile is tiles[0] for tile in tiles)
+    assert tiles[0].size == (256, 256)
+
+
+def test_get_many_fetches_each_tile_once(tile_server):
+    cache = TileCache(create_tile_source("http").get_tile)
+    tiles = cache.get_many([(3, 4, 5), (3, 4, 5), (3, 5, 5)], timeout=10)
+    
+    assert set(tiles) == {(3, 4, 5), (3, 5, 5)}
+    assert all(tile is not None for tile in tiles.values())
+    assert tile_server == {"/3/4/5.png": 1, "/3/5/5.png": 1}
+
+
+def test_later_loads_come_from_memory_then_disk(tile_server, tmp_path):
+    fetch = create_tile_source("http").get_tile
+    cache = TileCache(fetch, disk_dir=str(tmp_path))
+    first = cache.get(3, 4, 5)
+    assert cache.get(3, 4, 5) is first
+    assert (tmp_path / "3" / "4" / "5.png").exists()
+    
+    # A new cache, as in a fresh worker, has an empty memory tier
+    reloaded = TileCache(fetch, disk_dir=str(tmp_path)).get(3, 4, 5)
+    assert reloaded is not None and reloaded is not first
+    assert tile_server == {"/3/4/5.png": 1}
+
+
+def test_expired_disk_tiles_are_fetched_again(tile_server, tmp_path):
+    fetch = create_tile_source("http").get_tile
+    TileCache(fetch, disk_dir=str(tmp_path)).get(3, 4, 5)
+    TileCache(fetch, disk_dir=str(tmp_path), ttl=-1).get(3, 4, 5)
+    
+    assert tile_server == {"/3/4/5.png": 2}
@@ -0,0 +1,23 @@
+import pytest
+
+from src.image_generator import paginate_slide
+from src.models import SlideRequest
+from src.render_cache import request_seed
+
+
+@pytest.mark.parametrize("slide_format", ["horizontal", "vertical"])
+def test_pages_share_the_background_seed(slide_format):
+    request = SlideRequest(
+        title="Inventory",
+        format=slide_format,
+        table={
+            "headers": ["Item", "Count"],
+            "rows": [[f"Item {i}", str(i)] for i in range(80)],
+            "paginate": True
+        }
+    )
+    pages = paginate_slide(request)
+    
+    assert len(pages) > 1
+    assert sum(len(page.table.rows) for page in pages) == 80
+    assert {request_seed(page) for page in pages} == {request_seed(request)}